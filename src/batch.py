@@ -0,0 +1,206 @@
+# Custom Libraries
+import carrier
+import pipeline
+import track
+
+# Third-Party Libraries
+import soundfile as sf
+
+# Native-Python Libraries
+from concurrent import futures
+import json
+import os
+
+# Parameters of a job which can be omitted in the manifest
+DEFAULTS = {
+    'order': 48,
+    'alpha': 0.97,
+    'window_time': 20e-3,
+    'frame_time': 80e-3,
+    'threshold': -40,
+    'hysteresis': 0.0,
+    'hold_time': 0.0,
+    'amplitude': 0.01,
+    'waveform': 'square',
+    'wavetable_directory': None,
+    'streaming': False,
+    'decimation': 1,
+    'order_tolerance': None,
+    'engine': 'lpc',
+    'precision': 'single'
+}
+
+def load_manifest(path: str) -> list:
+    """ Reads the jobs of a manifest, a JSON file with a list of objects. Each one of them has the 'output' path,
+        either a 'voice' file or the envelope 'track' of a voice analyzed before, either a 'carrier' audio file or
+        a 'midi' file, and optionally any of the parameters in DEFAULTS. The jobs with a track take the parameters
+        of the analysis from it. Relative paths are taken from the directory of the manifest.
+        :param path: Path of the manifest
+        :return: List of jobs, as dictionaries with all the parameters
+    """
+    with open(path) as file:
+        manifest = json.load(file)
+    directory = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for entry in manifest:
+        job = dict(DEFAULTS, voice=None, track=None, carrier=None, midi=None)
+        job.update(entry)
+        if (job['voice'] is None) == (job['track'] is None) or 'output' not in entry:
+            raise ValueError('Every job needs either a voice or a track, and an output')
+        if (job['carrier'] is None) == (job['midi'] is None):
+            raise ValueError('Every job needs either a carrier or a MIDI file')
+        if job['track'] is not None and job['engine'] != 'lpc':
+            raise ValueError('Envelope tracks can only be rendered with the lpc engine')
+        for key in ('voice', 'track', 'output', 'carrier', 'midi', 'wavetable_directory'):
+            if job[key] is not None:
+                job[key] = os.path.join(directory, job[key])
+        jobs.append(job)
+    return jobs
+
+def voice_info(job: dict) -> tuple:
+    """ Describes the voice of a job, read from the voice file or from the header of its envelope track.
+        :param job: Parameters of the job
+        :return: Tuple (sample_rate, length, streaming) with the sampling rate and the number of samples
+                 of the voice, and whether the vocoder runs in streaming mode
+    """
+    if job.get('track') is not None:
+        envelope = track.EnvelopeTrack(job['track'])
+        return envelope.sample_rate, envelope.length, envelope.streaming
+    info = sf.info(job['voice'])
+    return info.samplerate, info.frames, job['streaming']
+
+def frame_sizes(job: dict, sample_rate: int) -> tuple:
+    """ Computes the sizes used to render a job.
+        :param job: Parameters of the job
+        :param sample_rate: Sampling rate of the voice
+        :return: Tuple (frame_size, window_size) in samples
+    """
+    if job.get('track') is not None:
+        # The windows of a track were set by the analysis, the frames have as many of them as fit in the frame time
+        window_size = track.EnvelopeTrack(job['track']).window_size
+        return max(int(job['frame_time'] * sample_rate) // window_size, 1) * window_size, window_size
+    window_size = int(job['window_time'] * sample_rate)
+    frame_size = int(job['frame_time'] / job['window_time']) * window_size
+    return frame_size, window_size
+
+def render_job(job: dict, start: int = 0, stop: int = None, output: str = None) -> int:
+    """ Renders a job, or a segment of it.
+        :param job: Parameters of the job
+        :param start: First sample of the segment, a multiple of the frame size
+        :param stop: End of the segment, by default the end of the voice
+        :param output: Path of the output file, by default the one of the job
+        :return: Number of samples written
+    """
+    # The models of the tracks are the all-pole ones, another engine would silently render them with the LPC one
+    if job.get('track') is not None and job['engine'] != 'lpc':
+        raise ValueError('Envelope tracks can only be rendered with the lpc engine')
+    sample_rate, _, _ = voice_info(job)
+    frame_size, window_size = frame_sizes(job, sample_rate)
+    if job['carrier'] is not None:
+        source = carrier.FileCarrier(job['carrier'], frame_size, sample_rate)
+    else:
+        source = carrier.MidiCarrier(
+            job['midi'],
+            frame_size,
+            sample_rate,
+            amplitude=job['amplitude'],
+            waveform=job['waveform'],
+            wavetable_directory=job['wavetable_directory']
+        )
+    try:
+        if job.get('track') is not None:
+            return track.render(
+                job['track'],
+                source,
+                job['output'] if output is None else output,
+                frame_size,
+                voice_threshold_dB=job['threshold'],
+                voice_hysteresis_dB=job['hysteresis'],
+                voice_hold_windows=round(job['hold_time'] * sample_rate / window_size),
+                precision=job['precision'],
+                start=start,
+                stop=stop
+            )
+        return pipeline.render(
+            job['voice'],
+            source,
+            job['output'] if output is None else output,
+            frame_size,
+            window_size,
+            job['order'],
+            job['alpha'],
+            voice_threshold_dB=job['threshold'],
+            voice_hysteresis_dB=job['hysteresis'],
+            voice_hold_windows=round(job['hold_time'] / job['window_time']),
+            streaming=job['streaming'],
+            decimation=job['decimation'],
+            order_tolerance=job['order_tolerance'],
+            engine=job['engine'],
+            precision=job['precision'],
+            start=start,
+            stop=stop
+        )
+    finally:
+        source.close()
+
+def split_job(job: dict, segment_time: float) -> list:
+    """ Splits a job into segments which can be rendered independently, with the same samples as a complete
+        render. Only the jobs in overlap mode with an audio file as the carrier and a gate without memory can be
+        split, because the synthesizer, the synthesis filter of the streaming mode and the hysteresis or hold time
+        of the gate depend on the whole past of the signal.
+        :param job: Parameters of the job
+        :param segment_time: Approximate duration of the segments in seconds
+        :return: List of (start, stop) samples of each segment
+    """
+    sample_rate, length, streaming = voice_info(job)
+    frame_size, _ = frame_sizes(job, sample_rate)
+    if streaming == True or job['carrier'] is None or job['hysteresis'] > 0 or job['hold_time'] > 0:
+        return [(0, length)]
+    segment_size = max(int(segment_time * sample_rate) // frame_size, 1) * frame_size
+    return [(start, min(start + segment_size, length)) for start in range(0, max(length, 1), segment_size)]
+
+def concatenate(paths: list, output: str, block_size: int = 65536):
+    """ Joins the segments rendered into the output file, block by block, and removes them.
+        :param paths: Paths of the segments, in order
+        :param output: Path of the output file
+        :param block_size: Number of samples copied on each step
+    """
+    info = sf.info(paths[0])
+    dtype = 'float64' if info.subtype == 'DOUBLE' else 'float32'
+    with sf.SoundFile(output, 'w', samplerate=info.samplerate, channels=1, subtype=info.subtype) as output_file:
+        for path in paths:
+            with sf.SoundFile(path) as segment_file:
+                for block in segment_file.blocks(blocksize=block_size, dtype=dtype):
+                    output_file.write(block)
+            os.remove(path)
+
+def run(jobs: list, workers: int = None, segment_time: float = 60.0) -> list:
+    """ Renders many jobs in parallel, with a pool of processes. Long voices are split into segments,
+        so a single job can use all the workers, and the segments are joined when all of them finish.
+        :param jobs: Parameters of each job
+        :param workers: Number of processes, by default the number of processors
+        :param segment_time: Approximate duration of the segments in seconds
+        :return: Number of samples written for each job
+    """
+    segments = [split_job(job, segment_time) for job in jobs]
+    parts = [
+        [None] if len(job_segments) == 1 else [f'{job["output"]}.{index}.part.wav' for index in range(len(job_segments))]
+        for job, job_segments in zip(jobs, segments)
+    ]
+    tasks = [
+        (job, start, stop, part)
+        for job, job_segments, job_parts in zip(jobs, segments, parts)
+        for (start, stop), part in zip(job_segments, job_parts)
+    ]
+    # Longer segments are submitted first, so the workers finish at about the same time
+    tasks.sort(key=lambda task: task[2] - task[1], reverse=True)
+    with futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in [executor.submit(render_job, *task) for task in tasks]:
+            result.result()
+
+    written = []
+    for job, job_parts in zip(jobs, parts):
+        if job_parts[0] is not None:
+            concatenate(job_parts, job['output'])
+        written.append(sf.info(job['output']).frames)
+    return written
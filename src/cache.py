@@ -0,0 +1,88 @@
+# Third-Party Libraries
+import numpy as np
+from scipy import fft
+
+# Native-Python Libraries
+import functools
+
+# Maximum number of entries kept by each one of the caches, the least recently used
+# entry is discarded when a new one doesn't fit
+CACHE_SIZE = 32
+
+def get_window(window: str, size: int, dtype=np.float64) -> np.array:
+    """ Gets a symmetric window of the given type and size, computing it only the first time it is requested.
+        The returned array is shared by all the users of the cache, so it is read-only.
+        :param window: Type of window, any name accepted by scipy.signal.get_window()
+        :param size: Number of samples of the window
+        :param dtype: Data type of the samples of the window
+        :return: Array containing the window
+    """
+    # The data type is normalized so that equivalent specifications share the same entry
+    return _get_window(window, size, np.dtype(dtype).str)
+
+def get_fft_size(size: int, lags: int) -> int:
+    """ Gets the length of a fast real FFT which is large enough to compute the first lags of the
+        autocorrelation of a sequence without circular aliasing.
+        :param size: Number of samples of the sequence
+        :param lags: Number of lags needed, from lag zero
+        :return: Length of the FFT
+    """
+    return _get_fft_size(size, lags)
+
+def get_decimation_filter(factor: int) -> np.array:
+    """ Gets the anti-aliasing filter used to downsample signals by the given factor, the same lowpass
+        FIR filter designed by scipy.signal.resample_poly(). The returned array is read-only.
+        :param factor: Downsampling factor
+        :return: Array containing the coefficients of the filter, with a delay of 10 * factor samples
+    """
+    return _get_decimation_filter(factor)
+
+def get_resampling_filter(up: int, down: int) -> np.array:
+    """ Gets the lowpass FIR filter used to change the sampling rate of signals by the factor up / down, the same
+        one designed by scipy.signal.resample_poly(), including the gain of the upsampling. The returned array is
+        read-only.
+        :param up: Upsampling factor
+        :param down: Downsampling factor
+        :return: Array containing the coefficients of the filter, at the upsampled rate
+    """
+    return _get_resampling_filter(up, down)
+
+def clear():
+    """ Discards all the entries of the caches
+    """
+    _get_window.cache_clear()
+    _get_fft_size.cache_clear()
+    _get_decimation_filter.cache_clear()
+    _get_resampling_filter.cache_clear()
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _get_window(window: str, size: int, dtype: str) -> np.array:
+    if window == 'hann':
+        # Same samples as scipy.signal.get_window(), without importing SciPy's signal processing package
+        w = (0.5 + 0.5 * np.cos(np.linspace(-np.pi, np.pi, size))).astype(dtype)
+    else:
+        from scipy import signal
+        w = signal.get_window(window, size, fftbins=False).astype(dtype)
+    w.setflags(write=False)
+    return w
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _get_fft_size(size: int, lags: int) -> int:
+    # The circular autocorrelation computed with an FFT of length L mixes the lag l with the lag l - L,
+    # which is null as long as L >= size + l, so only the largest lag needed sets the length
+    return fft.next_fast_len(size + lags - 1, real=True)
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _get_decimation_filter(factor: int) -> np.array:
+    from scipy import signal
+    h = signal.firwin(20 * factor + 1, 1.0 / factor, window=('kaiser', 5.0))
+    h.setflags(write=False)
+    return h
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _get_resampling_filter(up: int, down: int) -> np.array:
+    from scipy import signal
+    rate = max(up, down)
+    h = signal.firwin(20 * rate + 1, 1.0 / rate, window=('kaiser', 5.0)) * up
+    h.setflags(write=False)
+    return h
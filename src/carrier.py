@@ -0,0 +1,320 @@
+# Custom Libraries
+import cache
+import ringbuffer
+import synthesizer
+import wavetable
+
+# Third-Party Libraries
+import numpy as np
+import soundfile as sf
+
+# Native-Python Libraries
+import fractions
+import threading
+
+class FileCarrier:
+
+    def __init__(self, path: str, frame_size: int, sample_rate: int, loop: bool = True):
+        """ Initializes the FileCarrier instance, which reads the excitation from an audio file frame by frame,
+            so only about one frame of the file is kept in memory. Files with many channels are mixed down to mono
+            and resampled with the same filter as StreamingCarrier when the file has another sampling rate, so an
+            offline render uses the samples played in real time.
+            :param path: Path of the audio file
+            :param frame_size: Size of the frames
+            :param sample_rate: Sampling rate of the frames, the file is resampled to it
+            :param loop: If true, the file starts again after its end, otherwise silence follows it
+        """
+        self.file = sf.SoundFile(path)
+        if self.file.frames == 0:
+            self.file.close()
+            raise ValueError(f'{path} has no samples')
+        self.frame_size = frame_size
+        self.sample_rate = sample_rate
+        self.loop = loop
+
+        # The ratio of the rates is reduced to the smallest factors, 48 kHz from 44.1 kHz is 160 / 147
+        ratio = fractions.Fraction(sample_rate, self.file.samplerate)
+        self.resampler = None if ratio == 1 else Resampler(ratio.numerator, ratio.denominator)
+        # Samples read from the file for each frame, with one column per channel
+        self.buffer = np.zeros((-(-frame_size * ratio.denominator // ratio.numerator), self.file.channels), dtype=np.float32)
+        # Resampled samples left over from the previous frame
+        self.pending = np.zeros((0))
+
+    def read(self, count: int) -> np.array:
+        """ Reads the next samples of the file mixed down to mono, starting again after its end when looping.
+            :param count: Number of samples
+            :return: The samples read, zeros after the end of the file when not looping
+        """
+        samples = np.zeros((count), dtype=np.float32)
+        filled = 0
+        while filled < count:
+            block = self.buffer[:min(count - filled, len(self.buffer))]
+            read = self.file.read(out=block, always_2d=True).shape[0]
+            np.mean(block[:read], axis=1, out=samples[filled:filled + read])
+            filled += read
+            if read < len(block):
+                if self.loop == False:
+                    break
+                self.file.seek(0)
+        return samples
+
+    def generate_frame(self, out: np.array = None) -> np.array:
+        """ Reads the next frame of the file
+            :param out: Optional array where the frame is written, otherwise a new array is returned
+            :return: The frame read
+        """
+        if out is None:
+            out = np.zeros((self.frame_size), dtype=np.float32)
+        if self.resampler is None:
+            out[:] = self.read(self.frame_size)
+            return out
+        while len(self.pending) < self.frame_size:
+            self.pending = np.concatenate((self.pending, self.resampler.process(self.read(len(self.buffer)))))
+        out[:] = self.pending[:self.frame_size]
+        self.pending = self.pending[self.frame_size:]
+        return out
+
+    def seek(self, position: int):
+        """ Moves the reading position of the file, giving the same frames as reading it from the start.
+            :param position: Sample of the carrier, at the sampling rate of the frames, where the next frame starts
+        """
+        if self.resampler is None:
+            self.seek_file(position)
+            return
+        # The next output sample only needs the input samples up to its position in the file,
+        # and the ones before them which are still in the history of the filter
+        consumed = position * self.resampler.down // self.resampler.up
+        size = len(self.resampler.history)
+        self.seek_file(max(consumed - size, 0))
+        history = self.read(min(consumed, size))
+        self.resampler.reset(position, consumed, history)
+        self.pending = np.zeros((0))
+
+    def seek_file(self, position: int):
+        """ Moves the reading position of the file to a sample of the excitation, at the sampling rate of the file.
+            :param position: Sample of the excitation, which wraps around the file when looping
+        """
+        if self.loop == True:
+            position %= self.file.frames
+        self.file.seek(min(position, self.file.frames))
+
+    def close(self):
+        """ Closes the audio file.
+        """
+        self.file.close()
+
+class Resampler:
+
+    def __init__(self, up: int, down: int):
+        """ Initializes the Resampler instance, which changes the sampling rate of a signal received in blocks by the
+            factor up / down with a polyphase filter, giving the same samples as scipy.signal.upfirdn() with the filter
+            of scipy.signal.resample_poly() over the whole signal. Only the output samples are computed, each one
+            with the phase of the filter it needs, and the last input samples are kept for the next block.
+            :param up: Upsampling factor
+            :param down: Downsampling factor
+        """
+        self.up = up
+        self.down = down
+        # The coefficients are arranged with one phase per row, and each row is reversed so it
+        # multiplies the window of input samples ending with the newest one in chronological order
+        h = cache.get_resampling_filter(up, down)
+        taps = -(-len(h) // up)
+        self.phases = np.pad(h, (0, taps * up - len(h))).reshape(taps, up).T[:, ::-1].copy()
+        self.reset()
+
+    def reset(self, produced: int = 0, consumed: int = 0, history: np.array = None):
+        """ Clears the input samples kept, as if no block had been received yet, or moves the resampler to
+            any point of the signal, so it continues with the samples it would produce from the start.
+            :param produced: Number of output samples produced before, the next one is the first of the next block
+            :param consumed: Number of input samples received before, at most the position of the next output sample
+            :param history: Last input samples received before, the missing ones before them are zeros
+        """
+        self.history = np.zeros((self.phases.shape[1] - 1))
+        if history is not None and len(history) > 0:
+            self.history[-len(history):] = history
+        # Number of input samples received and output samples produced since the start
+        self.consumed = consumed
+        self.produced = produced
+
+    def process(self, x: np.array) -> np.array:
+        """ Resamples a new block of the signal.
+            :param x: Input samples
+            :return: Output samples whose position in the input falls inside the samples received
+        """
+        signal = np.concatenate((self.history, x))
+        stop = self.consumed + len(x)
+        # The n-th output sample is at n * down / up in the input, it uses the
+        # phase (n * down) % up of the filter over the input samples up to that point
+        time = (self.produced + np.arange(-(-stop * self.up // self.down) - self.produced)) * self.down
+        windows = np.lib.stride_tricks.sliding_window_view(signal, self.phases.shape[1])[time // self.up - self.consumed]
+        y = np.einsum('ij,ij->i', self.phases[time % self.up], windows)
+        self.history = signal[len(signal) - len(self.history):]
+        self.consumed = stop
+        self.produced += len(y)
+        return y
+
+class StreamingCarrier:
+
+    def __init__(
+        self,
+        path: str,
+        frame_size: int,
+        sample_rate: int,
+        loop: bool = True,
+        buffer_frames: int = 8,
+        block_size: int = 4096
+    ):
+        """ Initializes the StreamingCarrier instance, which plays an audio file as the excitation in real time.
+            A background thread reads the file in blocks, mixes it down to mono, resamples it when the file has
+            another sampling rate and keeps a ring buffer ahead of the frames requested, so generate_frame() only
+            copies samples from memory and never waits for the disk. The memory used doesn't depend on the length
+            of the file. When the thread falls behind, the missing samples are played as silence.
+            :param path: Path of the audio file
+            :param frame_size: Size of the frames
+            :param sample_rate: Sampling rate of the frames, the file is resampled to it
+            :param loop: If true, the file starts again after its end, otherwise silence follows it
+            :param buffer_frames: Number of frames that fit in the ring buffer
+            :param block_size: Number of samples of the file read on each step of the thread
+        """
+        self.file = sf.SoundFile(path)
+        if self.file.frames == 0:
+            self.file.close()
+            raise ValueError(f'{path} has no samples')
+        self.frame_size = frame_size
+        self.sample_rate = sample_rate
+        self.loop = loop
+        self.block = np.zeros((block_size, self.file.channels), dtype=np.float32)
+
+        # The ratio of the rates is reduced to the smallest factors, 48 kHz from 44.1 kHz is 160 / 147
+        ratio = fractions.Fraction(sample_rate, self.file.samplerate)
+        self.resampler = None if ratio == 1 else Resampler(ratio.numerator, ratio.denominator)
+        block_output = -(-block_size * ratio.numerator // ratio.denominator) + 1
+        self.ring = ringbuffer.RingBuffer(max(frame_size * buffer_frames, 2 * block_output))
+        # Largest number of samples written by the thread on each step
+        self.block_output = block_output
+
+        # Set after each frame taken from the ring buffer, so the thread can sleep while it is full
+        self.consumed = threading.Event()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        # The first frames are ready before returning
+        self.ring.wait(min(frame_size * 2, self.ring.capacity - block_output), 1.0)
+
+    @property
+    def underruns(self) -> int:
+        """ Number of frames which weren't ready in time and were completed with silence.
+        """
+        return self.ring.underruns
+
+    def generate_frame(self, out: np.array = None) -> np.array:
+        """ Takes the next frame of the file, read ahead by the thread.
+            :param out: Optional array where the frame is written, otherwise a new array is returned
+            :return: The frame
+        """
+        if out is None:
+            out = np.zeros((self.frame_size), dtype=np.float32)
+        self.ring.read(out)
+        self.consumed.set()
+        return out
+
+    def run(self):
+        """ Loop of the thread, it fills the ring buffer with the next samples of the file whenever there is
+            room for a block, and sleeps until a frame is taken otherwise.
+        """
+        while self.running == True:
+            if self.ring.free() < self.block_output:
+                # The event is cleared before checking again, so a frame taken in between is never missed
+                self.consumed.clear()
+                if self.ring.free() < self.block_output:
+                    self.consumed.wait(self.frame_size / self.sample_rate)
+                continue
+            if self.file.closed:
+                count = 0
+            else:
+                count = self.file.read(out=self.block, always_2d=True).shape[0]
+            if count < len(self.block):
+                if self.loop == True:
+                    self.file.seek(0)
+                else:
+                    # After the end of the file, the blocks are silent
+                    self.block[count:] = 0.0
+                    count = len(self.block)
+                    if not self.file.closed:
+                        self.file.close()
+            samples = np.mean(self.block[:count], axis=1)
+            if self.resampler is not None:
+                samples = self.resampler.process(samples)
+            self.ring.write(samples)
+
+    def close(self):
+        """ Stops the thread and closes the audio file.
+        """
+        self.running = False
+        self.consumed.set()
+        self.thread.join()
+        if not self.file.closed:
+            self.file.close()
+
+class MidiCarrier:
+
+    def __init__(
+        self,
+        path: str,
+        frame_size: int,
+        sample_rate: int,
+        amplitude: float = 0.01,
+        waveform: str = 'square',
+        wavetable_directory: str = None
+    ):
+        """ Initializes the MidiCarrier instance, which plays the notes of a MIDI file with the synthesizer.
+            The messages are applied at their sample inside the frame where they happen.
+            :param path: Path of the MIDI file
+            :param frame_size: Size of the frames
+            :param sample_rate: Sampling rate
+            :param amplitude: Amplitude of the notes
+            :param waveform: Waveform of the synthesizer, one of synthesizer.WAVEFORMS
+            :param wavetable_directory: Optional directory where the wavetables are stored and memory-mapped from
+        """
+        # The MIDI library is only needed by this carrier
+        import mido
+
+        self.frame_size = frame_size
+        self.sample_rate = sample_rate
+        self.amplitude = amplitude
+        self.synthesizer = synthesizer.create_synthesizer(frame_size, sample_rate, waveform, wavetable_directory)
+
+        # Messages of the file with their absolute time in samples, iterating a MIDI file
+        # yields the messages with the time elapsed since the previous one in seconds
+        self.messages = []
+        time = 0.0
+        for message in mido.MidiFile(path):
+            time += message.time
+            if message.type in ('note_on', 'note_off'):
+                self.messages.append((round(time * sample_rate), message))
+        self.next_message = 0
+        self.time = 0
+
+    def generate_frame(self, out: np.array = None) -> np.array:
+        """ Generates the next frame of the synthesizer, playing the messages which happen inside it.
+            :param out: Optional array where the frame is written, otherwise a new array is returned
+            :return: The generated frame
+        """
+        start = self.time
+        self.time += self.frame_size
+        while self.next_message < len(self.messages) and self.messages[self.next_message][0] < self.time:
+            time, message = self.messages[self.next_message]
+            frequency = wavetable.note_frequency(message.note)
+            offset = max(time - start, 0)
+            # A note on message with null velocity is a note off message
+            if message.type == 'note_on' and message.velocity > 0:
+                self.synthesizer.note_on(self.amplitude, frequency, offset=offset)
+            else:
+                self.synthesizer.note_off(frequency, offset=offset)
+            self.next_message += 1
+        return self.synthesizer.generate_frame(out=out)
+
+    def close(self):
+        """ Releases the resources of the carrier, nothing is kept open while playing a MIDI file.
+        """
+        pass
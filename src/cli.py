@@ -0,0 +1,106 @@
+# Custom Libraries
+import batch
+import kernels
+import pipeline
+import synthesizer
+import track
+
+# Third-Party Libraries
+import soundfile as sf
+
+# Native-Python Libraries
+import argparse
+import os
+import sys
+
+def render(arguments: argparse.Namespace):
+    """ Renders a voice file with the carrier selected in the arguments.
+    """
+    job = {key: getattr(arguments, key) for key in batch.DEFAULTS}
+    job.update(
+        voice=arguments.voice,
+        track=arguments.track,
+        carrier=arguments.carrier,
+        midi=arguments.midi,
+        output=arguments.output
+    )
+    batch.render_job(job)
+
+def analyze(arguments: argparse.Namespace):
+    """ Stores the envelope track of a voice file, to render it later with many carriers.
+    """
+    sample_rate = sf.info(arguments.voice).samplerate
+    track.analyze(
+        arguments.voice,
+        arguments.output,
+        int(arguments.window_time * sample_rate),
+        arguments.order,
+        arguments.alpha,
+        streaming=arguments.streaming,
+        decimation=arguments.decimation,
+        order_tolerance=arguments.order_tolerance,
+        precision=arguments.track_precision
+    )
+
+def run_batch(arguments: argparse.Namespace):
+    """ Renders all the jobs of a manifest in parallel.
+    """
+    jobs = batch.load_manifest(arguments.manifest)
+    batch.run(jobs, workers=arguments.workers, segment_time=arguments.segment_time)
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(prog='vocoder', description='LPC vocoder')
+    parser.add_argument('--backend', choices=kernels.BACKENDS, default=kernels.get_backend(), help='Implementation of the DSP kernels, Numba has to be installed to use it')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    render_parser = subparsers.add_parser('render', help='Render a voice file without audio devices')
+    voice = render_parser.add_mutually_exclusive_group(required=True)
+    voice.add_argument('--voice', help='Voice file, the output has its sampling rate')
+    voice.add_argument('--track', help='Envelope track of a voice, written by the analyze command')
+    source = render_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--carrier', help='Audio file used as the excitation')
+    source.add_argument('--midi', help='MIDI file played by the synthesizer as the excitation')
+    render_parser.add_argument('-o', '--output', required=True, help='Output file')
+    render_parser.add_argument('--engine', choices=pipeline.ENGINES, default=batch.DEFAULTS['engine'], help='Processing engine of the vocoder')
+    render_parser.add_argument('--order', type=int, default=batch.DEFAULTS['order'], help='Order of the articulatory filter, or cepstral coefficients of the spectral engine')
+    render_parser.add_argument('--alpha', type=float, default=batch.DEFAULTS['alpha'], help='Pre-emphasis filter coefficient')
+    render_parser.add_argument('--window-time', type=float, default=batch.DEFAULTS['window_time'], help='Duration of the vocoder windows in seconds')
+    render_parser.add_argument('--frame-time', type=float, default=batch.DEFAULTS['frame_time'], help='Duration of the frames read from the files in seconds')
+    render_parser.add_argument('--threshold', type=float, default=batch.DEFAULTS['threshold'], help='Voice threshold in dB')
+    render_parser.add_argument('--hysteresis', type=float, default=batch.DEFAULTS['hysteresis'], help='The gate closes this many dB below the threshold')
+    render_parser.add_argument('--hold-time', type=float, default=batch.DEFAULTS['hold_time'], help='Time in seconds the gate stays open after the voice falls below the closing level')
+    render_parser.add_argument('--amplitude', type=float, default=batch.DEFAULTS['amplitude'], help='Amplitude of the synthesizer notes')
+    render_parser.add_argument('--waveform', choices=synthesizer.WAVEFORMS, default=batch.DEFAULTS['waveform'], help='Waveform of the synthesizer, table and saw read a bandlimited impulse train or sawtooth from wavetables')
+    render_parser.add_argument('--wavetable-directory', default=batch.DEFAULTS['wavetable_directory'], help='Directory where the wavetables are stored and memory-mapped from')
+    render_parser.add_argument('--precision', choices=tuple(pipeline.PRECISIONS), default=batch.DEFAULTS['precision'], help='Precision of the samples along the processing')
+    render_parser.add_argument('--streaming', action='store_true', help='Process the windows without overlap')
+    render_parser.add_argument('--decimation', type=int, default=batch.DEFAULTS['decimation'], help='Downsampling factor of the voice before the analysis')
+    render_parser.add_argument('--order-tolerance', type=float, default=batch.DEFAULTS['order_tolerance'], help='Choose the order of each window from its prediction error')
+    render_parser.set_defaults(function=render)
+
+    analyze_parser = subparsers.add_parser('analyze', help='Store the envelope track of a voice file, rendered later with --track')
+    analyze_parser.add_argument('--voice', required=True, help='Voice file')
+    analyze_parser.add_argument('-o', '--output', required=True, help='Envelope track file')
+    analyze_parser.add_argument('--order', type=int, default=batch.DEFAULTS['order'], help='Order of the articulatory filter')
+    analyze_parser.add_argument('--alpha', type=float, default=batch.DEFAULTS['alpha'], help='Pre-emphasis filter coefficient')
+    analyze_parser.add_argument('--window-time', type=float, default=batch.DEFAULTS['window_time'], help='Duration of the vocoder windows in seconds')
+    analyze_parser.add_argument('--streaming', action='store_true', help='Estimate the models of the streaming mode')
+    analyze_parser.add_argument('--decimation', type=int, default=batch.DEFAULTS['decimation'], help='Downsampling factor of the voice before the analysis')
+    analyze_parser.add_argument('--order-tolerance', type=float, default=batch.DEFAULTS['order_tolerance'], help='Choose the order of each window from its prediction error')
+    analyze_parser.add_argument('--track-precision', choices=tuple(track.TRACK_PRECISIONS), default='quantized', help='Storage format of the models')
+    analyze_parser.set_defaults(function=analyze)
+
+    batch_parser = subparsers.add_parser('batch', help='Render the jobs of a manifest in parallel')
+    batch_parser.add_argument('manifest', help='JSON file with the list of jobs')
+    batch_parser.add_argument('--workers', type=int, default=None, help='Number of processes, by default one per processor')
+    batch_parser.add_argument('--segment-time', type=float, default=60.0, help='Duration of the segments long voices are split into, in seconds')
+    batch_parser.set_defaults(function=run_batch)
+
+    arguments = parser.parse_args(argv)
+    # The processes of a batch render select the backend from the environment
+    os.environ['VOCODER_BACKEND'] = arguments.backend
+    kernels.set_backend(arguments.backend)
+    arguments.function(arguments)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,380 @@
+# Custom Libraries
+import pipeline
+import synthesizer
+import ringbuffer
+
+# Third-Party Libraries
+import numpy as np
+import pyaudio
+
+# Native-Python Libraries
+import threading
+import time
+import queue
+
+class Engine:
+
+    def __init__(
+        self,
+        frame_size: int,
+        window_size: int,
+        sample_rate: int,
+        order: int,
+        alpha: float,
+        volume_queue: queue.Queue,
+        threshold_queue: queue.Queue,
+        amplitude_queue: queue.Queue,
+        voice_threshold_dB: float = -40,
+        synth_amplitude: float = 0.01,
+        ring_buffer_frames: int = 8,
+        poll_interval: float = 10e-3,
+        stats_frames: int = 256,
+        decimation: int = 1,
+        order_tolerance: float = None,
+        vocoder_engine: str = 'lpc',
+        channels: int = 1,
+        voice_hysteresis_dB: float = 0.0,
+        voice_hold_time: float = 0.0,
+        hop_size: int = None,
+        synth_waveform: str = 'square',
+        wavetable_directory: str = None
+    ):
+        """ Initializes the Engine instance, which runs the vocoder in a worker thread. The worker sleeps until
+            the audio input callback delivers a complete frame, instead of polling continuously.
+            :param frame_size: Size of the audio frames exchanged with the audio callbacks
+            :param window_size: Size of the windows processed by the vocoder, a divisor of the frame size
+                                unless a hop size is given
+            :param sample_rate: Sampling rate
+            :param order: Order of the articulatory filter of the vocoder
+            :param alpha: Pre-emphasis filter coefficient of the vocoder
+            :param volume_queue: Queue where the level of the voice of each window is put, in dB
+            :param threshold_queue: Queue where the voice threshold in dB is received
+            :param amplitude_queue: Queue where the amplitude of the synthesizer, from 0 to 10, is received
+            :param voice_threshold_dB: Initial voice threshold, windows below it are muted
+            :param synth_amplitude: Initial amplitude of the synthesizer notes
+            :param ring_buffer_frames: Number of frames that fit in the ring buffers shared with the audio callbacks
+            :param poll_interval: Maximum time in seconds the worker sleeps before checking the MIDI port
+                                  and the controls, even if no audio frame arrived
+            :param stats_frames: Number of recent frames whose processing time is kept for the statistics,
+                                 and of recent notes whose latency is kept
+            :param decimation: Downsampling factor of the voice before the analysis of the vocoder
+            :param order_tolerance: If given, the vocoder chooses the order of each window from its prediction error
+            :param vocoder_engine: Processing engine of the vocoder, one of pipeline.ENGINES
+            :param channels: Number of channels of the audio streams, with interleaved samples. Each input channel
+                             is an independent voice, vocoded with the same excitation into its output channel
+            :param voice_hysteresis_dB: The gate of the voice closes this many dB below the voice threshold
+            :param voice_hold_time: Time in seconds the gate stays open after the voice falls below the closing level
+            :param hop_size: If given, low-latency mode. The vocoder runs in streaming mode estimating a model every
+                             hop_size samples from the last window_size samples of the voice, so the frames can be
+                             much shorter than the window, as long as they are a multiple of the hop size.
+                             The gate of the voice works on hops too
+            :param synth_waveform: Waveform of the synthesizer, one of synthesizer.WAVEFORMS
+            :param wavetable_directory: Optional directory where the wavetables are stored and memory-mapped from
+        """
+        # The gate works on the windows of the vocoder, or on its hops in low-latency mode
+        gate_size = window_size if hop_size is None else hop_size
+        if frame_size % gate_size != 0:
+            raise ValueError('The frame size has to be a multiple of the window size, or of the hop size')
+
+        self.frame_size = frame_size
+        self.window_size = window_size
+        self.volume_queue = volume_queue
+        self.threshold_queue = threshold_queue
+        self.amplitude_queue = amplitude_queue
+        self.voice_threshold_dB = voice_threshold_dB
+        self.synth_amplitude = synth_amplitude
+        self.poll_interval = poll_interval
+        self.sample_rate = sample_rate
+        self.channels = channels
+
+        self.vocoder = pipeline.create_vocoder(
+            vocoder_engine,
+            window_size,
+            order,
+            alpha,
+            decimation=decimation,
+            order_tolerance=order_tolerance,
+            channels=channels,
+            streaming=hop_size is not None,
+            hop_size=hop_size
+        )
+        # The first frame would otherwise import the packages of the filters in the worker, missing many deadlines
+        self.vocoder.warm_up(frame_size)
+        self.synthesizer = synthesizer.create_synthesizer(frame_size, sample_rate, synth_waveform, wavetable_directory)
+        self.gate = pipeline.VoiceGate(
+            gate_size,
+            voice_threshold_dB,
+            voice_hysteresis_dB,
+            round(voice_hold_time * sample_rate / gate_size),
+            channels=channels
+        )
+
+        # Create the ring buffers shared with the audio callbacks, and the preallocated frames used
+        # to move the samples in and out of them, so that no array is created for each frame. The ring buffers
+        # hold interleaved samples, while the vocoder works with one channel per row
+        self.voice_ring = ringbuffer.RingBuffer(frame_size * channels * ring_buffer_frames)
+        self.output_ring = ringbuffer.RingBuffer(frame_size * channels * ring_buffer_frames)
+        self.voice_frame = np.zeros((frame_size, channels), dtype=np.float32)
+        self.carrier_frame = np.zeros((frame_size), dtype=np.float32)
+        self.excitation = np.zeros((channels, frame_size), dtype=np.float32)
+        self.output_frame = np.zeros((channels, frame_size), dtype=np.float32)
+        self.interleaved_frame = np.zeros((frame_size, channels), dtype=np.float32)
+        self.output_buffer = np.zeros((frame_size * channels), dtype=np.float32)
+
+        # Instrumentation of the worker, each frame has to be processed before the
+        # next one arrives, the frame duration is the deadline of the processing
+        self.deadline = frame_size / sample_rate
+        self.processing_times = np.zeros((stats_frames))
+        self.note_latencies = np.zeros((stats_frames))
+        self.reset_stats()
+
+        # The MIDI messages are timestamped when they arrive with the position of the voice input at that time,
+        # counted in samples written into the input ring buffer, and they are played at the same position of
+        # the excitation. The clock of the input is updated by its callback as (time, position)
+        self.midi_queue = queue.SimpleQueue()
+        self.pending_notes = []
+        self.input_position = 0
+        self.input_clock = (time.perf_counter(), 0)
+        self.frame_position = 0
+
+        self.midi_port = None
+        self.carrier = None
+        self.running = False
+        self.thread = None
+
+    def start(self, midi_port=None, carrier=None):
+        """ Starts the worker thread.
+            :param midi_port: Optional MIDI input port, opened with mido, polled to play the synthesizer. Its messages
+                              are timestamped when polled, a port opened with on_midi_message() as its callback
+                              timestamps them when they arrive and isn't passed here
+            :param carrier: Optional source of the excitation played instead of the synthesizer, any object with
+                            a generate_frame(out) method which doesn't block, such as carrier.StreamingCarrier
+        """
+        if self.running == True:
+            raise RuntimeError('The engine is already running')
+        self.midi_port = midi_port
+        self.carrier = carrier
+
+        # Each run starts from empty ring buffers, so the positions of the voice input used to timestamp the MIDI
+        # messages start at zero with it, and neither the samples nor the notes left from a previous run are played
+        self.voice_ring.reset()
+        self.output_ring.reset()
+        self.input_position = 0
+        self.input_clock = (time.perf_counter(), 0)
+        self.frame_position = 0
+        self.pending_notes.clear()
+        self.synthesizer.events.clear()
+        self.vocoder.reset()
+        self.gate.reset()
+        self.reset_stats()
+
+        # The output starts with one frame of silence, so the first processed
+        # frame is ready before the output callback needs it
+        self.output_ring.write(np.zeros((self.frame_size * self.channels), dtype=np.float32))
+
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """ Stops the worker thread, waiting until it finishes the frame being processed.
+        """
+        if self.running == False:
+            return
+        self.running = False
+        # Wake up the worker in case it is waiting for a frame
+        self.voice_ring.ready.set()
+        self.thread.join()
+        self.thread = None
+
+    def on_input_frame(self, in_data, frame_count, time_info, status):
+        """ Callback of the PyAudio input stream, the samples are copied straight into the preallocated ring buffer.
+        """
+        self.input_position += self.voice_ring.write_bytes(in_data) // self.channels
+        self.input_clock = (time.perf_counter(), self.input_position)
+        return (in_data, pyaudio.paContinue)
+
+    def on_midi_message(self, message):
+        """ Callback of the MIDI input port, the message is timestamped with the position of the voice input
+            it arrives at, extrapolated from the last input frame, and queued for the worker.
+            :param message: MIDI message received, from mido
+        """
+        arrival = time.perf_counter()
+        clock_time, clock_position = self.input_clock
+        self.midi_queue.put((arrival, clock_position + (arrival - clock_time) * self.sample_rate, message))
+
+    def on_output_frame(self, in_data, frame_count, time_info, status):
+        """ Callback of the PyAudio output stream. When the output ring buffer doesn't have enough samples,
+            it is filled with zeros and the underrun is counted by the ring buffer.
+        """
+        samples = frame_count * self.channels
+        self.output_ring.read(self.output_buffer[:samples])
+        return (self.output_buffer[:samples].tobytes(), pyaudio.paContinue)
+
+    def run(self):
+        """ Loop of the worker thread, it sleeps until a new voice frame is available and processes it.
+        """
+        while self.running == True:
+            ready = self.voice_ring.wait(self.frame_size * self.channels, self.poll_interval)
+            self.update_controls()
+            self.update_notes()
+            if ready == True and self.running == True:
+                start = time.perf_counter()
+                self.process_frame()
+                self.record_frame(time.perf_counter() - start)
+
+    def update_controls(self):
+        """ Takes the latest values of the controls sent from the user interface.
+        """
+        while not self.threshold_queue.empty():
+            self.voice_threshold_dB = float(self.threshold_queue.get())
+        while not self.amplitude_queue.empty():
+            # Logarithmic amplitude formula, new_amplitude goes from 0 to 10:
+            new_amplitude = float(self.amplitude_queue.get())
+            self.synth_amplitude = 0 if new_amplitude==0 else (10**((new_amplitude ) / 5 - 3))
+
+    def update_notes(self):
+        """ Takes the messages received from the MIDI port since the last check.
+        """
+        if self.midi_port is not None:
+            for message in self.midi_port.iter_pending():
+                self.on_midi_message(message)
+        while not self.midi_queue.empty():
+            self.pending_notes.append(self.midi_queue.get())
+
+    def schedule_notes(self) -> list:
+        """ Schedules the notes of the messages which arrived while the voice of the frame being processed was
+            recorded, at the same sample of the excitation, so the synthesizer plays them inside the frame. The
+            messages which arrived after the frame wait for the next one. While a carrier is played instead of the
+            synthesizer, the messages are dropped.
+            :return: List of (arrival, offset) tuples with the arrival time and the sample of the notes started
+        """
+        started = []
+        end = self.frame_position + self.frame_size
+        if self.carrier is not None:
+            self.pending_notes.clear()
+            self.frame_position = end
+            return started
+        while len(self.pending_notes) > 0 and self.pending_notes[0][1] < end:
+            arrival, position, message = self.pending_notes.pop(0)
+            if message.type not in ('note_on', 'note_off'):
+                continue
+            # The messages which arrived before the frame, while the engine was stopped, are played at its beginning
+            offset = max(int(position - self.frame_position), 0)
+            frequency = 440 * (2**((message.note - 69) / 12))
+            # A note on message with null velocity is a note off message
+            if message.type == 'note_on' and message.velocity > 0:
+                self.synthesizer.note_on(self.synth_amplitude, frequency, offset=offset)
+                started.append((arrival, offset))
+            else:
+                self.synthesizer.note_off(frequency, offset=offset)
+        self.frame_position = end
+        return started
+
+    def reset_stats(self):
+        """ Clears the instrumentation of the worker, so the statistics describe a single run.
+        """
+        self.processed_frames = 0
+        self.deadline_misses = 0
+        self.max_processing_time = 0.0
+        self.input_queue_size = 0
+        self.output_queue_size = 0
+        self.played_notes = 0
+        self.max_note_latency = 0.0
+
+    def record_frame(self, processing_time: float):
+        """ Records the processing time of a frame, and the state of the ring buffers after it.
+            :param processing_time: Time taken to process the frame in seconds
+        """
+        self.processing_times[self.processed_frames % len(self.processing_times)] = processing_time
+        self.processed_frames += 1
+        if processing_time > self.deadline:
+            self.deadline_misses += 1
+        self.max_processing_time = max(self.max_processing_time, processing_time)
+        self.input_queue_size = self.voice_ring.available()
+        self.output_queue_size = self.output_ring.available()
+
+    def record_notes(self, started: list, queued: int):
+        """ Records the note-to-sound latency of the notes started in the frame just written to the output ring
+            buffer, from the arrival of their message until their first sample leaves the ring buffer when the
+            output callback keeps consuming it in time. The buffers of the audio devices aren't included.
+            :param started: Notes started in the frame, as returned by schedule_notes()
+            :param queued: Number of samples of each channel queued in the output ring buffer ahead of the frame
+        """
+        now = time.perf_counter()
+        for arrival, offset in started:
+            latency = now - arrival + (queued + self.vocoder.latency + offset) / self.sample_rate
+            self.note_latencies[self.played_notes % len(self.note_latencies)] = latency
+            self.played_notes += 1
+            self.max_note_latency = max(self.max_note_latency, latency)
+
+    @property
+    def algorithmic_latency(self) -> int:
+        """ Number of samples a voice sample takes to reach the output when the worker keeps up, without the
+            buffers of the audio devices: the input frame being completed, the delay of the vocoder and the frame
+            of silence the output starts with. In low-latency mode the vocoder doesn't delay the voice, so it only
+            depends on the frame size.
+        """
+        return 2 * self.frame_size + self.vocoder.latency
+
+    def stats(self) -> dict:
+        """ Takes a snapshot of the instrumentation of the engine, it can be called from any thread.
+            The latency is the time from a voice sample entering the input ring buffer until the output sample
+            produced with it leaves the output ring buffer: the input frame being completed, the delay of the
+            overlapped windows of the vocoder and the output samples queued ahead of it. The note latency is the
+            time from the arrival of a MIDI note on message until the first sample of the note leaves the output
+            ring buffer, the same as the latency of the voice recorded with it. The buffers of the audio devices
+            aren't included.
+            :return: Dictionary with the statistics, times in milliseconds
+        """
+        count = min(self.processed_frames, len(self.processing_times))
+        recent = self.processing_times[:count]
+        mean = float(recent.mean()) if count > 0 else 0.0
+        # The output queue was measured after writing the last frame, which is also queued
+        frame_samples = self.frame_size * self.channels
+        queued = max(self.output_queue_size - frame_samples, 0) // self.channels
+        delay = self.vocoder.latency
+        notes = min(self.played_notes, len(self.note_latencies))
+        note_latencies = self.note_latencies[:notes]
+        return {
+            'frames': self.processed_frames,
+            'deadline_ms': self.deadline * 1e3,
+            'processing_mean_ms': mean * 1e3,
+            'processing_p99_ms': float(np.percentile(recent, 99)) * 1e3 if count > 0 else 0.0,
+            'processing_max_ms': self.max_processing_time * 1e3,
+            'load': mean / self.deadline,
+            'deadline_misses': self.deadline_misses,
+            'input_overruns': self.voice_ring.overruns,
+            'output_overruns': self.output_ring.overruns,
+            'output_underruns': self.output_ring.underruns,
+            'input_queue_frames': self.input_queue_size / frame_samples,
+            'output_queue_frames': self.output_queue_size / frame_samples,
+            'latency_ms': (self.frame_size + delay + queued) / self.sample_rate * 1e3,
+            'algorithmic_latency_ms': self.algorithmic_latency / self.sample_rate * 1e3,
+            'notes': self.played_notes,
+            'note_latency_mean_ms': float(note_latencies.mean()) * 1e3 if notes > 0 else 0.0,
+            'note_latency_max_ms': self.max_note_latency * 1e3
+        }
+
+    def process_frame(self):
+        """ Processes one frame of the voice with a new frame of the synthesizer, or of the carrier selected, as
+            the excitation. The synthesizer renders the frame just in time, with the notes received while the voice
+            of the frame was recorded. Every channel is gated with its own copy of the excitation, and all of them
+            are vocoded at once.
+        """
+        self.voice_ring.read(self.voice_frame.reshape(-1))
+        started = self.schedule_notes()
+        source = self.synthesizer if self.carrier is None else self.carrier
+        source.generate_frame(out=self.carrier_frame)
+        self.excitation[:] = self.carrier_frame
+        self.gate.threshold_dB = self.voice_threshold_dB
+        voice_level_dB = self.gate.process(self.voice_frame.T, self.excitation)
+        self.vocoder.process_frames(self.voice_frame.T, self.excitation, out=self.output_frame)
+        # The level meter shows the loudest channel of each window
+        for level in voice_level_dB.reshape(self.channels, -1).max(axis=0):
+            self.volume_queue.put(level)
+        self.interleaved_frame[:] = self.output_frame.T
+        queued = self.output_ring.available() // self.channels
+        self.output_ring.write(self.interleaved_frame.reshape(-1))
+        if self.carrier is None:
+            self.record_notes(started, queued)
@@ -11,7 +11,8 @@ class App(threading.Thread):
     def __init__(self, start_callback, stop_callback,
                 volume_queue, threshold_queue, amplitude_queue, 
                 input_list, output_list,midi_list, source_list,
-                default_input = '(Seleccionar)', default_output = '(Seleccionar)'):
+                default_input = '(Seleccionar)', default_output = '(Seleccionar)',
+                stats_callback = None):
         threading.Thread.__init__(self)
 
         self.start_callback = start_callback
@@ -19,6 +20,8 @@ class App(threading.Thread):
         self.volume_queue = volume_queue
         self.threshold_queue = threshold_queue
         self.amplitude_queue = amplitude_queue
+        # Optional function returning the statistics of the processing engine
+        self.stats_callback = stats_callback
 
         self.input_list = input_list
         self.output_list = output_list
@@ -39,7 +42,7 @@ class App(threading.Thread):
         self.root = ThemedTk(theme="equilux", themebg=True)
         self.root.protocol("WM_DELETE_WINDOW", self.callback)
 
-        self.root.geometry("600x300")
+        self.root.geometry("600x375")
         self.root.title("Vocoder")
 
         self.root.columnconfigure(0, weight=1, minsize=200)
@@ -47,6 +50,7 @@ class App(threading.Thread):
         self.root.rowconfigure(0, weight=1, minsize=75)
         self.root.rowconfigure(1, weight=1, minsize=75)
         self.root.rowconfigure(2, weight=1, minsize=75)
+        self.root.rowconfigure(3, weight=1, minsize=75)
 
         frame = ttk.Frame(self.root)
         frame.grid(row=0, column=0)
@@ -87,6 +91,19 @@ class App(threading.Thread):
         self.cb_midi.pack()
 
 
+        frame = ttk.Frame(self.root)
+        frame.grid(row=3, column=0)
+
+        self.lbl_source = ttk.Label(master=frame, text=f"Fuente de excitación: ")
+        self.lbl_source.pack()
+
+        self.str_source = tk.StringVar(self.root)
+        self.str_source.set("(Seleccionar)" if len(self.source_list) == 0 else self.source_list[0])
+        self.cb_source = ttk.Combobox(frame, textvariable=self.str_source, state="readonly", values=self.source_list)
+        self.cb_source.config(width=40)
+        self.cb_source.pack()
+
+
 
         frame = ttk.Frame(self.root)
         frame.grid(row=0, column=1)
@@ -141,6 +158,11 @@ class App(threading.Thread):
         self.lbl_input_vol = ttk.Label(master=lbl_frame, text="  00 dB")
         self.lbl_input_vol.pack(anchor="w")
 
+        stats_frame = ttk.Frame(frame)
+        stats_frame.grid(row=3, column=0, columnspan=2)
+        self.lbl_stats = ttk.Label(master=stats_frame, text="")
+        self.lbl_stats.pack(anchor="w")
+
 
         frame = ttk.Frame(self.root)
         frame.grid(row=2, column=1)
@@ -186,6 +208,8 @@ class App(threading.Thread):
         while not self.volume_queue.empty():
             self.volume_db = int(self.volume_queue.get())
         self.set_input_volume(self.volume_db)
+        if self.stats_callback is not None:
+            self.set_stats(self.stats_callback())
         self.root.after(100, self.periodicCall)
 
     def toggle_run(self):
@@ -194,13 +218,20 @@ class App(threading.Thread):
         self.cb_input.config(state='disable')
         self.cb_output.config(state='disable')
         self.cb_midi.config(state='disable')
+        self.cb_source.config(state='disable')
 
-        self.start_callback(self.str_input.get(), self.str_output.get(), self.str_midi.get())
+        self.start_callback(self.str_input.get(), self.str_output.get(), self.str_midi.get(), self.str_source.get())
 
     def set_input_volume(self, volume_db):
         self.lbl_input_vol.config(text=f'  {volume_db} dB')
         self.pb_input_vol.config(value=100+volume_db)
 
+    def set_stats(self, stats):
+        self.lbl_stats.config(
+            text=f"Carga: {stats['load'] * 100:.0f} %  Latencia: {stats['latency_ms']:.0f} ms  "
+                 f"Cortes: {stats['output_underruns'] + stats['input_overruns']}"
+        )
+
     def get_input_name(self):
         return self.str_input
 
@@ -0,0 +1,294 @@
+# Third-Party Libraries
+import numpy as np
+
+# Native-Python Libraries
+import os
+
+# Backends which can be selected to run the kernels, 'auto' selects Numba when it is installed
+BACKENDS = ('numpy', 'numba', 'auto')
+
+# Batches with up to this number of rows are filtered row by row by SciPy's compiled filter,
+# larger ones by the recursion over the samples computed for all the rows at once. So the NumPy
+# backend loads scipy.signal on the first frame, both in the batched and the per-frame paths,
+# which Vocoder.warm_up() does before processing in real time, while the Numba backend doesn't need it
+ROW_FILTER_ROWS = 64
+
+def all_pole_filter(a: np.array, x: np.array) -> np.array:
+    """ Filters each row of x with its own all-pole filter 1 / A(z), starting from rest.
+        :param a: Denominator coefficients, one filter per row, with a[:, 0] equal to one
+        :param x: Input samples, one frame per row
+        :return: Filtered frames, in double precision
+    """
+    return _kernels['all_pole_filter'](a, x)
+
+def segment_filter(a: np.array, x: np.array, history: np.array) -> tuple:
+    """ Filters a frame with an all-pole filter whose coefficients change along it, continuing from the outputs
+        of the previous frame. The frame is split in as many segments of about the same size as filters are given.
+        :param a: Denominator coefficients, one filter per segment, with a[:, 0] equal to one
+        :param x: Input samples of the frame
+        :param history: Last outputs of the filter, starting from the most recent one, as many as its order
+        :return: Tuple (y, history) with the filtered frame in double precision and the updated history of outputs
+    """
+    return _kernels['segment_filter'](a, x, history)
+
+def levinson_durbin(r: np.array) -> tuple:
+    """ Runs the Levinson-Durbin recursion over a batch of autocorrelation sequences, see lpc.levinson_durbin().
+        :param r: Autocorrelation lags in double precision, one sequence per row
+        :return: Tuple (a, k, error), one sequence per row
+    """
+    return _kernels['levinson_durbin'](r)
+
+def preemphasis(x: np.array, coef, previous: np.array = None) -> np.array:
+    """ Applies the pre-emphasis filter to a batch of sequences, see lpc.preemphasis().
+        :param x: Samples of the sequences, one sequence per row, at least two samples
+        :param coef: Pre-emphasis filter coefficient, with the data type of x
+        :param previous: Optional sample preceding each sequence, with the data type of x
+        :return: Filtered sequences, with the data type of x
+    """
+    return _kernels['preemphasis'](x, coef, previous)
+
+def overlap_add(partial: np.array, windows: np.array) -> np.array:
+    """ Adds the windows vocoded for a block of frames, with the 50% overlap of the Vocoder. The contributions
+        are added in the same order that Vocoder.process_frame() follows for each sample: the end of the
+        overlapped window of a frame, then the current window of that frame, then the beginning of the
+        overlapped window of the next frame.
+        :param partial: Output of the frame preceding the block, y(n-1), with one channel per row
+        :param windows: Overlapped windows of the frames of the block followed by their current windows,
+                        with shape (channels, 2 * frames, frame_size)
+        :return: Output frames with shape (channels, frames + 1, frame_size), the last one is partial
+    """
+    return _kernels['overlap_add'](partial, windows)
+
+def get_backend() -> str:
+    """ Gets the name of the backend running the kernels.
+    """
+    return _backend
+
+def set_backend(name: str):
+    """ Selects the implementation of the kernels. Numba is only imported when it is selected, and its kernels
+        are compiled here for both sample types, so no frame waits for the compiler. The compiled kernels are
+        cached on disk, the next processes only load them.
+        :param name: One of BACKENDS
+    """
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f'Unknown backend {name}')
+    if name == 'auto':
+        try:
+            import numba
+            name = 'numba'
+        except ImportError:
+            name = 'numpy'
+    _kernels.update(_numba_kernels() if name == 'numba' else _NUMPY_KERNELS)
+    _backend = name
+
+def _numpy_all_pole_filter(a: np.array, x: np.array) -> np.array:
+    if len(x) <= ROW_FILTER_ROWS:
+        # SciPy's signal processing package is slow to import, it is loaded by the first small batch
+        from scipy import signal
+        y = np.zeros(x.shape)
+        for row in range(len(x)):
+            y[row] = signal.lfilter([1.0], a[row], x[row])
+        return y
+    # The recursion runs over the samples, while each step is computed for all the rows at once.
+    # The output is stored after order samples of initial rest, so that each step can read
+    # the previous outputs as a contiguous slice, in the order matching the reversed coefficients
+    order = a.shape[-1] - 1
+    y = np.zeros((x.shape[0], order + x.shape[-1]))
+    a_reversed = np.ascontiguousarray(a[:, :0:-1])
+    for n in range(x.shape[-1]):
+        y[:, order + n] = x[:, n] - np.einsum('ij,ij->i', a_reversed, y[:, n:order + n])
+    return y[:, order:]
+
+def _numpy_segment_filter(a: np.array, x: np.array, history: np.array) -> tuple:
+    from scipy import signal
+    steps, order = a.shape[0], a.shape[1] - 1
+
+    # The state of the filter is rebuilt from the past outputs for each segment, because
+    # the internal state of the transposed direct form depends on the coefficients.
+    # For an all-pole filter, the m-th state is -sum(a[m + 1 + i] * y[n - 1 - i]), which is
+    # the correlation of the coefficients with the history (same as signal.lfiltic(), but vectorized)
+    y = np.zeros((len(x)))
+    bounds = np.arange(steps + 1) * len(x) // steps
+    for step in range(steps):
+        start, stop = bounds[step], bounds[step + 1]
+        if start == stop:
+            continue
+        zi = -np.correlate(a[step, 1:], history, mode='full')[order - 1:]
+        y[start:stop], _ = signal.lfilter([1.0], a[step], x[start:stop], zi=zi)
+        history = np.concatenate((y[stop - 1:start - 1 if start > 0 else None:-1], history))[:order]
+    return y, history
+
+def _numpy_levinson_durbin(r: np.array) -> tuple:
+    order = r.shape[-1] - 1
+    a = np.zeros_like(r)
+    a[:, 0] = 1.0
+    k = np.zeros((len(r), order))
+    error = np.zeros_like(r)
+    error[:, 0] = r[:, 0]
+    for m in range(1, order + 1):
+        # Reflection coefficient of the current stage, computed from the prediction error of the previous one.
+        # Silent sequences (no energy left to predict) keep a null reflection coefficient instead of dividing by zero
+        previous_error = error[:, m - 1]
+        valid = previous_error > 0.0
+        k[:, m - 1] = -np.einsum('ij,ij->i', a[:, :m], r[:, m:0:-1]) / np.where(valid, previous_error, 1.0)
+        k[~valid, m - 1] = 0.0
+
+        # Update the coefficients of the error filter using the previous ones in reversed order
+        a[:, 1:m + 1] += k[:, m - 1:m] * a[:, m - 1::-1]
+        error[:, m] = previous_error * (1.0 - k[:, m - 1] ** 2)
+    return a, k, error
+
+def _numpy_preemphasis(x: np.array, coef, previous: np.array = None) -> np.array:
+    y = np.empty_like(x)
+    y[:, 1:] = x[:, 1:] - coef * x[:, :-1]
+    if previous is None:
+        # The initial state of the filter is 2 * x[0] - x[1], the output of the filter is added to it
+        y[:, 0] = x[:, 0] + (2 * x[:, 0] - x[:, 1])
+    else:
+        y[:, 0] = x[:, 0] - coef * previous
+    return y
+
+def _numpy_overlap_add(partial: np.array, windows: np.array) -> np.array:
+    channels, frame_count, frame_size = windows.shape[0], windows.shape[1] // 2, windows.shape[2]
+    half_size = frame_size // 2
+    overlapped, full = windows[:, :frame_count], windows[:, frame_count:]
+    y = np.zeros((channels, frame_count + 1, frame_size), dtype=windows.dtype)
+    y[:, 0] = partial
+    y[:, 1:, :half_size] += overlapped[:, :, frame_size - half_size:]
+    y[:, 1:] += full
+    y[:, :-1, half_size:] += overlapped[:, :, :frame_size - half_size]
+    return y
+
+_NUMPY_KERNELS = {
+    'all_pole_filter': _numpy_all_pole_filter,
+    'segment_filter': _numpy_segment_filter,
+    'levinson_durbin': _numpy_levinson_durbin,
+    'preemphasis': _numpy_preemphasis,
+    'overlap_add': _numpy_overlap_add
+}
+
+def _numba_kernels() -> dict:
+    """ Compiles the kernels with Numba, they follow the operations of the NumPy kernels in the same order.
+        :return: Dictionary with the kernels
+    """
+    import numba
+
+    @numba.njit(cache=True)
+    def all_pole_filter(a, x):
+        rows, size = x.shape
+        order = a.shape[1] - 1
+        y = np.zeros((rows, order + size))
+        for row in range(rows):
+            for n in range(size):
+                accumulator = 0.0
+                for j in range(order):
+                    accumulator += a[row, order - j] * y[row, n + j]
+                y[row, order + n] = x[row, n] - accumulator
+        return y[:, order:]
+
+    @numba.njit(cache=True)
+    def segment_filter(a, x, history):
+        steps, order = a.shape[0], a.shape[1] - 1
+        size = x.shape[0]
+        # The outputs follow the previous ones, stored from the oldest one
+        y = np.zeros((order + size))
+        for j in range(order):
+            y[order - 1 - j] = history[j]
+        for step in range(steps):
+            for n in range(step * size // steps, (step + 1) * size // steps):
+                accumulator = 0.0
+                for j in range(1, order + 1):
+                    accumulator += a[step, j] * y[order + n - j]
+                y[order + n] = x[n] - accumulator
+        return y[order:].copy(), y[::-1][:order].copy()
+
+    @numba.njit(cache=True)
+    def levinson_durbin(r):
+        count, lags = r.shape
+        order = lags - 1
+        a = np.zeros((count, lags))
+        k = np.zeros((count, order))
+        error = np.zeros((count, lags))
+        previous = np.zeros((lags))
+        for row in range(count):
+            a[row, 0] = 1.0
+            error[row, 0] = r[row, 0]
+            for m in range(1, order + 1):
+                previous_error = error[row, m - 1]
+                reflection = 0.0
+                if previous_error > 0.0:
+                    accumulator = 0.0
+                    for j in range(m):
+                        accumulator += a[row, j] * r[row, m - j]
+                    reflection = -accumulator / previous_error
+                k[row, m - 1] = reflection
+                previous[:m] = a[row, :m]
+                for j in range(1, m + 1):
+                    a[row, j] += reflection * previous[m - j]
+                error[row, m] = previous_error * (1.0 - reflection * reflection)
+        return a, k, error
+
+    @numba.njit(cache=True)
+    def preemphasis(x, coef, previous, continued):
+        y = np.empty_like(x)
+        for row in range(x.shape[0]):
+            for n in range(1, x.shape[1]):
+                y[row, n] = x[row, n] - coef * x[row, n - 1]
+            if continued:
+                y[row, 0] = x[row, 0] - coef * previous[row]
+            else:
+                y[row, 0] = x[row, 0] + ((x[row, 0] + x[row, 0]) - x[row, 1])
+        return y
+
+    @numba.njit(cache=True)
+    def overlap_add(partial, windows):
+        channels, frame_count, frame_size = windows.shape[0], windows.shape[1] // 2, windows.shape[2]
+        half_size = frame_size // 2
+        y = np.zeros((channels, frame_count + 1, frame_size), dtype=windows.dtype)
+        for channel in range(channels):
+            y[channel, 0] = partial[channel]
+            for frame in range(frame_count):
+                for n in range(half_size):
+                    y[channel, frame + 1, n] += windows[channel, frame, frame_size - half_size + n]
+                for n in range(frame_size):
+                    y[channel, frame + 1, n] += windows[channel, frame_count + frame, n]
+                for n in range(frame_size - half_size):
+                    y[channel, frame, half_size + n] += windows[channel, frame, n]
+        return y
+
+    # The arrays are passed contiguous, so each kernel is only compiled for one layout of each sample type
+    kernels = {
+        'all_pole_filter': lambda a, x: all_pole_filter(np.ascontiguousarray(a), np.ascontiguousarray(x)),
+        'segment_filter': lambda a, x, history: segment_filter(
+            np.ascontiguousarray(a),
+            np.ascontiguousarray(x),
+            np.ascontiguousarray(history, dtype=np.float64)
+        ),
+        'levinson_durbin': lambda r: levinson_durbin(np.ascontiguousarray(r)),
+        'preemphasis': lambda x, coef, previous=None: preemphasis(
+            np.ascontiguousarray(x),
+            coef,
+            np.ascontiguousarray(x[:, 0] if previous is None else previous),
+            previous is not None
+        ),
+        'overlap_add': lambda partial, windows: overlap_add(np.ascontiguousarray(partial), np.ascontiguousarray(windows))
+    }
+
+    # Every kernel is compiled for the sample types used, before any frame is processed
+    for dtype in (np.float32, np.float64):
+        x = np.ones((2, 8), dtype=dtype)
+        kernels['all_pole_filter'](np.ones((2, 3)), x)
+        kernels['segment_filter'](np.ones((2, 3)), x[0], np.zeros((2)))
+        kernels['preemphasis'](x, dtype(0.5))
+        kernels['preemphasis'](x, dtype(0.5), x[:, 0])
+        kernels['overlap_add'](x[:, :4], x.reshape(2, 2, 4))
+    kernels['levinson_durbin'](np.ones((2, 3)))
+    return kernels
+
+# Kernels of the backend selected, the NumPy ones by default unless the VOCODER_BACKEND environment variable
+# selects another backend, which is also how the processes of a batch render inherit it
+_kernels = dict(_NUMPY_KERNELS)
+_backend = 'numpy'
+if os.environ.get('VOCODER_BACKEND', 'numpy') != 'numpy':
+    set_backend(os.environ['VOCODER_BACKEND'])
@@ -0,0 +1,129 @@
+# Custom Libraries
+import cache
+import kernels
+
+# Third-Party Libraries
+import numpy as np
+from scipy import fft
+
+def preemphasis(x: np.array, coef: float, previous: np.array = None) -> np.array:
+    """ Applies the pre-emphasis filter 1 - coef * z^-1 to the sequences along the last axis of x. Without the
+        previous samples, the first output sample is computed with the same initial condition used by
+        librosa.effects.preemphasis(), which assumes the sequence was extrapolated linearly before its start,
+        so both give the same samples.
+        :param x: Samples of the sequences, along the last axis, at least two of them
+        :param coef: Pre-emphasis filter coefficient
+        :param previous: Optional sample preceding each sequence, to continue filtering a longer signal
+        :return: Filtered sequences, with the data type of x (at least single precision)
+    """
+    x = np.asarray(x)
+    if not np.issubdtype(x.dtype, np.floating):
+        x = x.astype(np.float64)
+    # The kernel filters a batch of sequences, any other shape is flattened here and restored after it
+    if previous is not None:
+        previous = np.broadcast_to(np.asarray(previous, dtype=x.dtype), x.shape[:-1]).reshape(-1)
+    y = kernels.preemphasis(np.ascontiguousarray(x.reshape(-1, x.shape[-1])), x.dtype.type(coef), previous)
+    return y.reshape(x.shape)
+
+def autocorrelation(x: np.array, lags: int) -> np.array:
+    """ Estimates the first lags of the short-time autocorrelation of the sequences along the last axis of x,
+        with a real FFT only as long as needed to compute those lags without circular aliasing.
+        :param x: Samples of the sequences, along the last axis
+        :param lags: Number of lags to compute, from lag zero
+        :return: Autocorrelation lags, along the last axis
+    """
+    nfft = cache.get_fft_size(x.shape[-1], lags)
+    spectrum = fft.rfft(x, n=nfft, axis=-1)
+    return fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, n=nfft, axis=-1)[..., :lags]
+
+def levinson_durbin(r: np.array) -> tuple:
+    """ Solves the Yule-Walker equations of the linear prediction model using the Levinson-Durbin recursion.
+        Many sequences of autocorrelation lags can be solved at once by stacking them on the leading axes,
+        the recursion runs over the model order while each step is computed for all the sequences together.
+        :param r: Autocorrelation lags, from lag zero to the order of the model, along the last axis
+        :return: Tuple (a, k, error) with the error filter coefficients starting with one, the reflection
+                 coefficients of each stage and the prediction error of the models from order zero up to the
+                 requested order, all of them along the last axis
+    """
+    r = np.asarray(r, dtype=np.float64)
+    if r.shape[-1] < 1:
+        raise ValueError('At least the lag zero of the autocorrelation is needed')
+
+    # The recursion is written for a 2-D batch of sequences, any other
+    # shape is flattened here and restored when returning the results
+    shape = r.shape[:-1]
+    order = r.shape[-1] - 1
+    r = r.reshape(-1, order + 1)
+
+    a, k, error = kernels.levinson_durbin(np.ascontiguousarray(r))
+    return a.reshape(shape + (order + 1,)), k.reshape(shape + (order,)), error.reshape(shape + (order + 1,))
+
+def reflection_to_filter(k: np.array) -> np.array:
+    """ Converts reflection coefficients into the coefficients of the error filter with the step-up recursion.
+        Many sets of coefficients can be converted at once by stacking them on the leading axes.
+        :param k: Reflection coefficients of each stage, along the last axis
+        :return: Error filter coefficients starting with one, along the last axis
+    """
+    k = np.asarray(k, dtype=np.float64)
+    order = k.shape[-1]
+    a = np.zeros(k.shape[:-1] + (order + 1,))
+    a[..., 0] = 1.0
+    for m in range(1, order + 1):
+        a[..., 1:m + 1] += k[..., m - 1:m] * a[..., m - 1::-1]
+    return a
+
+def decimate(x: np.array, factor: int) -> np.array:
+    """ Downsamples the sequences along the last axis of x with a polyphase anti-aliasing filter,
+        which only computes the samples that are kept.
+        :param x: Samples of the sequences, along the last axis
+        :param factor: Downsampling factor
+        :return: Downsampled sequences, along the last axis
+    """
+    if factor == 1:
+        return x
+    # The delay of the filter is a multiple of the factor, so the output samples are aligned with
+    # the input samples kept after dropping that delay from the output of the polyphase filter
+    # SciPy's signal processing package is slow to import, and it is only needed here for the decimation
+    from scipy import signal
+    h = cache.get_decimation_filter(factor)
+    delay = (len(h) - 1) // 2 // factor
+    return signal.upfirdn(h, x, 1, factor, axis=-1)[..., delay:delay - (-x.shape[-1] // factor)]
+
+def decimated_order(order: int, factor: int) -> int:
+    """ Gets the order of the model estimated from a downsampled signal, which covers the same
+        formants as the model of the given order at the original sampling rate.
+        :param order: Order of the model at the original sampling rate
+        :param factor: Downsampling factor
+        :return: Order of the model at the downsampled rate
+    """
+    return max(order // factor, 1)
+
+def resample_model(a: np.array, factor: int, points: int = 128, passband: float = 0.9) -> tuple:
+    """ Maps all-pole models estimated at a downsampled rate back to the original sampling rate. The power
+        spectrum of each model is stretched over the band of the downsampled signal, and continued above it with
+        the level at the edge of the passband of the anti-aliasing filter, then the autocorrelation of that
+        spectrum is solved again at the original rate with the same order. Moving the poles instead would keep
+        their frequencies, but tilts the envelope between them, while this keeps the shape and the level.
+        Many models can be mapped at once by stacking them on the leading axes.
+        :param a: Error filter coefficients starting with one, along the last axis
+        :param factor: Downsampling factor used to estimate the models
+        :param points: Number of frequencies evaluated in the band of the downsampled signal
+        :param passband: Fraction of the band of the downsampled signal not affected by the anti-aliasing filter
+        :return: Tuple (a, k, error) as returned by levinson_durbin(), at the original sampling rate
+    """
+    order = a.shape[-1] - 1
+    envelope = 1.0 / np.abs(fft.rfft(a, n=2 * points, axis=-1)) ** 2
+    edge = int(passband * points)
+    spectrum = np.empty(a.shape[:-1] + (factor * points + 1,))
+    spectrum[..., :edge + 1] = envelope[..., :edge + 1]
+    spectrum[..., edge + 1:] = envelope[..., edge:edge + 1]
+    return levinson_durbin(fft.irfft(spectrum, axis=-1)[..., :order + 1])
+
+def select_order(error: np.array, tolerance: float) -> np.array:
+    """ Chooses the order of each model from its prediction error curve, as the lowest order whose
+        prediction error is close enough to the one of the highest order estimated.
+        :param error: Prediction error of the models from order zero up to the highest order, along the last axis
+        :param tolerance: Relative excess of prediction error allowed
+        :return: Order chosen for each model
+    """
+    return np.argmax(error <= error[..., -1:] * (1.0 + tolerance), axis=-1)
@@ -1,32 +1,19 @@
 # Custom Libraries
-import vocoder
-import synthesizer
+import carrier
+import engine
 import gui
+import kernels
 
 # Third-Party Libraries
 import pyaudio
-import numpy as np
 import mido
 
 # Native-Python Libraries
+import os
 import queue
 
-def on_output_frame(in_data, frame_count, time_info, status):
-    global output_queue
-    if output_queue.empty() == True:
-        buffer = np.zeros((FRAME_SIZE), dtype=np.float32)
-    else:
-        buffer = output_queue.get()
-    return (buffer.astype(np.float32).tobytes(), pyaudio.paContinue)
-
-def on_input_frame(in_data, frame_count, time_info, status):
-    voice_queue.put(np.frombuffer(in_data, dtype=np.float32))
-    return (in_data, pyaudio.paContinue)
-
-
-
-def start_vocoder(input_device, output_device, midi_device):
-    global input_stream, output_stream, input_port, output_queue, s, vocoder_running
+def start_vocoder(input_device, output_device, midi_device, source):
+    global input_stream, output_stream, input_port, carrier_source, vocoder_running
 
     # Choose a specific input device and create a stream to start reading
     # audio samples from it, using the non-blocking method (callback)
@@ -39,7 +26,7 @@ def start_vocoder(input_device, output_device, midi_device):
         output=False,
         frames_per_buffer=FRAME_SIZE,
         input_device_index=selected_input_device['index'],
-        stream_callback=on_input_frame
+        stream_callback=e.on_input_frame
     )
 
     # Choose a specific output device and create a stream to start sending
@@ -54,13 +41,19 @@ def start_vocoder(input_device, output_device, midi_device):
         frames_per_buffer=FRAME_SIZE,
         #output_device_index=virtual_mic['index'],
         output_device_index=selected_output_device['index'],
-        stream_callback=on_output_frame
+        stream_callback=e.on_output_frame
     )
     
-    input_port = mido.open_input(midi_device)
+    # The MIDI messages are timestamped by the engine as soon as they arrive
+    input_port = mido.open_input(midi_device, callback=e.on_midi_message)
 
-    # Initialize the output queue
-    output_queue.put(np.zeros((FRAME_SIZE), dtype=np.float32))
+    # The audio files are streamed from disk by a thread of their own, resampled to the rate of the streams
+    carrier_source = None
+    if CARRIER_SOURCES.get(source) is not None:
+        carrier_source = carrier.StreamingCarrier(CARRIER_SOURCES[source], FRAME_SIZE, SAMPLE_RATE)
+
+    # Start the processing engine before the streams, so it is ready for the first frame
+    e.start(carrier=carrier_source)
 
     # Start the streams
     input_stream.start_stream()
@@ -70,42 +63,92 @@ def start_vocoder(input_device, output_device, midi_device):
 
 
 def stop_vocoder():
-    global input_stream, output_stream, input_port, output_queue, vocoder_running
+    global input_stream, output_stream, input_port, carrier_source, vocoder_running
 
     # Close streams
     input_stream.stop_stream()
     input_stream.close()
     output_stream.stop_stream()
     output_stream.close()
+    e.stop()
+    input_port.close()
+    if carrier_source is not None:
+        if carrier_source.underruns > 0:
+            print(f'Carrier underruns: {carrier_source.underruns}')
+        carrier_source.close()
+
+    # Report the dropouts counted by the ring buffers shared with the audio callbacks
+    stats = e.stats()
+    print(f'Input overruns: {stats["input_overruns"]}, output underruns: {stats["output_underruns"]}')
+    print(
+        f'Frames: {stats["frames"]}, deadline misses: {stats["deadline_misses"]}, '
+        f'processing time: {stats["processing_mean_ms"]:.2f} ms mean, {stats["processing_max_ms"]:.2f} ms max '
+        f'of {stats["deadline_ms"]:.0f} ms, latency: {stats["latency_ms"]:.0f} ms'
+    )
+    if stats['notes'] > 0:
+        print(
+            f'Notes: {stats["notes"]}, note-to-sound latency: {stats["note_latency_mean_ms"]:.0f} ms mean, '
+            f'{stats["note_latency_max_ms"]:.0f} ms max'
+        )
 
     vocoder_running = False
 
 
 # Parameters needed to configure the streams
 SAMPLE_RATE = 48000
-CHANNELS = 1
+CHANNELS = 1                                    # Independent voices, one per input channel
 SAMPLE_WIDTH_IN_BYTES = 4
+VOCODER_ENGINE = 'lpc'                          # 'lpc' (all-pole filter) or 'spectral' (STFT cross-synthesis)
+KERNEL_BACKEND = 'auto'                         # 'numpy', 'numba' or 'auto' (Numba when it is installed)
 ORDER = 48
+DECIMATION = 1                                  # Downsampling of the voice before the analysis, the order is divided by it
+ORDER_TOLERANCE = None                          # Relative prediction error used to choose the order of each window
 FRAME_TIME = 80e-3                              # Audio Buffer Duration
 FRAME_SIZE = int(FRAME_TIME * SAMPLE_RATE)
 WINDOW_TIME = 20e-3                              # Vocoder Processing Duration
 WINDOW_SIZE = int(WINDOW_TIME * SAMPLE_RATE)
+LOW_LATENCY = False                             # Small audio buffers, with a model every buffer over a sliding window
+LOW_LATENCY_FRAME_SIZE = 128                    # Audio Buffer Size in low-latency mode, from 128 to 256 samples (64 with Numba)
+HOP_SIZE = None
+if LOW_LATENCY:
+    FRAME_SIZE = LOW_LATENCY_FRAME_SIZE
+    HOP_SIZE = LOW_LATENCY_FRAME_SIZE
 PRE_EMPHASIS = 0.97
 voice_threshold_dB = -40
+VOICE_HYSTERESIS_DB = 6                         # The voice gate closes this many dB below the threshold
+VOICE_HOLD_TIME = 200e-3                        # Time the voice gate stays open during short pauses
 synth_amplitude = 0.01
+SYNTH_WAVEFORM = 'square'                       # 'square', 'blit', 'table' or 'saw' (bandlimited impulse train or sawtooth from wavetables)
+WAVETABLE_DIRECTORY = None                      # Directory where the wavetables are stored, computed on every startup if None
+ASSETS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'assets')
+CARRIER_SOURCES = {                             # Excitations selectable in the user interface, None is the synthesizer
+    'Sintetizador (MIDI)': None,
+    'Guitarra eléctrica': os.path.join(ASSETS_DIRECTORY, 'electric_guitar.wav'),
+    'Jazzy riff': os.path.join(ASSETS_DIRECTORY, 'jazzy_riff.wav')
+}
+
+# Queues used to exchange the controls and the voice level with the user interface
+volume_queue = queue.Queue()
+threshold_queue = queue.Queue()
+amplitude_queue = queue.Queue()
 
 # Initializations
+kernels.set_backend(KERNEL_BACKEND)                                 # Compiled before the first frame
 p = pyaudio.PyAudio()                                               # PyAudio Instance
-v = vocoder.Vocoder(WINDOW_SIZE, ORDER, PRE_EMPHASIS)               # Vocoder Instance
-s = synthesizer.Synthesizer(FRAME_SIZE, SAMPLE_RATE)                # Synthesizer Instance
+e = engine.Engine(                                                  # Processing Engine Instance
+    FRAME_SIZE, WINDOW_SIZE, SAMPLE_RATE, ORDER, PRE_EMPHASIS,
+    volume_queue, threshold_queue, amplitude_queue,
+    voice_threshold_dB=voice_threshold_dB, synth_amplitude=synth_amplitude,
+    decimation=DECIMATION, order_tolerance=ORDER_TOLERANCE, vocoder_engine=VOCODER_ENGINE,
+    channels=CHANNELS, voice_hysteresis_dB=VOICE_HYSTERESIS_DB, voice_hold_time=VOICE_HOLD_TIME,
+    hop_size=HOP_SIZE, synth_waveform=SYNTH_WAVEFORM, wavetable_directory=WAVETABLE_DIRECTORY
+)
+print(f'Algorithmic latency: {e.stats()["algorithmic_latency_ms"]:.1f} ms, kernels: {kernels.get_backend()}')
 vocoder_running = False
 input_stream = None
 output_stream = None
-
-# Create the needed queues
-voice_queue = queue.Queue()
-output_queue = queue.Queue()
-excitation_queue = queue.Queue()
+input_port = None
+carrier_source = None
 
 # Fetch devices' information and parameters from the PyAudio API, we can select
 # to use the default input/output devices or allow the user to choose some of the 
@@ -124,54 +167,21 @@ midi_devices = mido.get_input_names()
 input_list = [ device['name'] for device in filter(lambda device: device['maxInputChannels'] > 0, devices_info) ]
 output_list = [ device['name'] for device in filter(lambda device: device['maxOutputChannels'] > 0, devices_info) ]
 
-volume_queue = queue.Queue()
-threshold_queue = queue.Queue()
-amplitude_queue = queue.Queue()
 application = gui.App(  start_vocoder, stop_vocoder, volume_queue, threshold_queue, amplitude_queue,
-                        input_list, output_list, midi_devices, input_list,
-                        default_input_device['name'], default_output_device['name']
+                        input_list, output_list, midi_devices, list(CARRIER_SOURCES),
+                        default_input_device['name'], default_output_device['name'],
+                        stats_callback=e.stats
                         )
 application.start()
 
-while True:
-    while vocoder_running == True:
-        try:
-            if not threshold_queue.empty():
-                voice_threshold_dB = float(threshold_queue.get())
-            if not amplitude_queue.empty():
-                # Logarithmic amplitude formula, new_amplitude goes from 0 to 10:
-                new_amplitude = float(amplitude_queue.get())
-                synth_amplitude = 0 if new_amplitude==0 else (10**((new_amplitude ) / 5 - 3))
-            if voice_queue.empty() == False and excitation_queue.empty() == False:
-                voice_frame = voice_queue.get()
-                excitation = excitation_queue.get()
-                output_frame = np.zeros(voice_frame.shape, dtype=np.float32)
-                voice_windows = np.split(voice_frame, FRAME_SIZE // WINDOW_SIZE)
-                excitation_windows = np.split(excitation, FRAME_SIZE // WINDOW_SIZE)
-                for index, voice_window in enumerate(voice_windows):
-                    voice_level = voice_window.std()
-                    voice_level_dB = 20 * np.log10(voice_level)
-                    excitation_window = excitation_windows[index]*voice_level*10 if voice_level_dB > voice_threshold_dB else np.zeros(WINDOW_SIZE)
-                    output_window = v.process_frame(
-                        voice_window,
-                        excitation_window,
-                    )
-                    output_frame[index * WINDOW_SIZE:(index + 1) * WINDOW_SIZE] = output_window
-                    volume_queue.put(voice_level_dB)
-
-                output_queue.put(output_frame)
-            elif excitation_queue.empty() == True:
-                generated_frame = s.generate_frame()
-                excitation_queue.put(generated_frame)
-                
-            for message in input_port.iter_pending():
-                if message.type == 'note_on':
-                    s.note_on(synth_amplitude, 440 * (2**((message.note - 69) / 12)))
-                elif message.type == 'note_off':
-                    s.note_off(440 * (2**((message.note - 69) / 12)))
-                    
-        except KeyboardInterrupt:
-            break
-    
+# The main thread sleeps until the user interface is closed, all the
+# processing is done by the engine's worker thread
+try:
+    application.join()
+except KeyboardInterrupt:
+    pass
+if vocoder_running == True:
+    stop_vocoder()
+
 # Clean up the resources taken from the system by PyAudio
 p.terminate()
\ No newline at end of file
@@ -0,0 +1,213 @@
+# Third-Party Libraries
+import numpy as np
+
+# Waveforms supported by the oscillator bank
+WAVEFORMS = ('square', 'blit', 'table')
+
+def sincm(phase: np.array, M: np.array) -> np.array:
+    """ SincM function from: https://ccrma.stanford.edu/~stilti/papers/blit.pdf, written in terms of the phase
+        of the waveform in cycles, so SincM(x, M) with x = M * phase.
+        :param phase: Array of phase values, in cycles
+        :param M: Number of harmonics to preserve, broadcast against the phase
+        :return: Array containing the resulting waveform
+    """
+    # The sine of the denominator is computed once, and only its zeros are replaced with the limit of the quotient.
+    # Close to the zeros, the rounding of the phase dominates both sines, so the limit is also used there
+    denominator = np.sin(np.pi * phase)
+    result = np.sin(np.pi * M * phase)
+    singular = np.abs(denominator) <= 1.0e-8
+    np.divide(result, M * denominator, out=result, where=~singular)
+    if singular.any():
+        M = np.broadcast_to(M, phase.shape)
+        result[singular] = np.cos(np.pi * M[singular] * phase[singular]) / np.cos(np.pi * phase[singular])
+    return result
+
+def bandlimited_table(waveform: str, harmonics: int, size: int) -> np.array:
+    """ Computes one period of a bandlimited waveform from its harmonics with an inverse real FFT, with one
+        extra guard sample at the end (equal to the first one) to interpolate without wrapping the indexes.
+        :param waveform: 'square' for a square wave, 'saw' for a rising sawtooth wave or 'blit' for a pulse train with unit peak
+        :param harmonics: Number of harmonics of the waveform, limited to the ones the table can hold
+        :param size: Number of samples of the period
+        :return: Array with size + 1 samples
+    """
+    harmonics = max(min(harmonics, size // 2 - 1), 1)
+    k = np.arange(1, harmonics + 1)
+    spectrum = np.zeros((size // 2 + 1), dtype=complex)
+    if waveform == 'square':
+        # Only odd harmonics of sines, with amplitudes decaying as 1 / k
+        spectrum[k[::2]] = -0.5j * size * 4.0 / (np.pi * k[::2])
+    elif waveform == 'saw':
+        # All the harmonics of sines, with amplitudes decaying as 1 / k and alternating signs,
+        # so the wave rises from zero at the start of the period and falls at its middle
+        spectrum[k] = -0.5j * size * 2.0 / (np.pi * k) * (-1.0) ** (k + 1)
+    elif waveform == 'blit':
+        # Cosines with equal amplitudes, normalized to have a peak of one
+        spectrum[0] = size / (1.0 + 2.0 * harmonics)
+        spectrum[k] = size / (1.0 + 2.0 * harmonics)
+    else:
+        raise ValueError(f'Unknown bandlimited waveform {waveform}')
+    table = np.fft.irfft(spectrum, n=size)
+    return np.append(table, table[0])
+
+class OscillatorBank:
+
+    def __init__(
+        self,
+        sample_rate: int,
+        waveform: str = 'square',
+        wavetable=None,
+        voices: int = 32,
+        ramp_size: int = 1
+    ):
+        """ Initializes the OscillatorBank instance, which renders all the voices at once keeping
+            the phase of each one of them from one block to the next one.
+            :param sample_rate: Sampling rate
+            :param waveform: 'square' (naive square wave), 'blit' (bandlimited impulse train) or
+                             'table' (read from the bandlimited tables of the wavetable)
+            :param wavetable: Instance of wavetable.Wavetable used when waveform is 'table'
+            :param voices: Maximum number of voices playing at the same time
+            :param ramp_size: Number of samples taken by the level of a voice to fade in or fade out
+        """
+        if waveform not in WAVEFORMS:
+            raise ValueError(f'Unknown waveform {waveform}')
+        if waveform == 'table' and wavetable is None:
+            raise ValueError('A wavetable is needed to read the waveform from tables')
+        if ramp_size < 1:
+            raise ValueError('The ramp has to last at least one sample')
+
+        self.sample_rate = sample_rate
+        self.waveform = waveform
+        self.wavetable = wavetable
+        self.ramp_size = ramp_size
+
+        # State of the voices, one slot per voice. The phase is kept in cycles,
+        # while the level is the gain of the envelope going towards the target
+        self.frequency = np.zeros((voices))
+        self.amplitude = np.zeros((voices))
+        self.phase = np.zeros((voices))
+        self.level = np.zeros((voices))
+        self.target = np.zeros((voices))
+        self.active = np.zeros((voices), dtype=bool)
+        self.harmonics = np.zeros((voices))
+        self.table = np.zeros((voices), dtype=np.intp)
+
+        # Slot used by each frequency playing
+        self.slots = dict()
+
+    def note_on(self, amplitude: float, frequency: float):
+        """ Starts a voice, or updates its amplitude if the frequency is already playing,
+            without restarting its phase.
+            :param amplitude: Amplitude of the waveform
+            :param frequency: Fundamental frequency of the waveform, a positive number
+        """
+        if frequency <= 0.0:
+            raise ValueError('The frequency has to be a positive number')
+        slot = self.slots.get(frequency)
+        if slot is None:
+            slot = self._allocate_slot()
+            self.slots[frequency] = slot
+            self.frequency[slot] = frequency
+            self.phase[slot] = 0.0
+            self.level[slot] = 0.0
+            self.active[slot] = True
+
+            # Number of harmonics below the Nyquist frequency, following the BLIT definition
+            # of M for the impulse train, or the table of the mip-map serving this frequency
+            P = self.sample_rate / frequency
+            self.harmonics[slot] = 2 * P // 2 - 1
+            if self.waveform == 'table':
+                self.table[slot] = self.wavetable.table_index(frequency)
+        self.amplitude[slot] = amplitude
+        self.target[slot] = 1.0
+
+    def note_off(self, frequency: float) -> bool:
+        """ Starts fading out a voice, which is released when its level reaches zero.
+            :param frequency: Fundamental frequency of the waveform
+            :return: True if the frequency was playing, False otherwise
+        """
+        slot = self.slots.get(frequency)
+        if slot is None or self.target[slot] == 0.0:
+            return False
+        self.target[slot] = 0.0
+        return True
+
+    def render(self, size: int, out: np.array = None) -> np.array:
+        """ Renders the next block of samples of all the voices.
+            :param size: Number of samples of the block
+            :param out: Optional array where the block is written
+            :return: Array containing the resulting waveform
+        """
+        if out is None:
+            out = np.zeros((size))
+        else:
+            out[:] = 0.0
+        slots = np.flatnonzero(self.active)
+        if len(slots) == 0:
+            return out
+
+        # Phase of every voice at every sample of the block, as a (voices x samples) matrix,
+        # and the phase where each voice will start the next block. The phase is wrapped to
+        # two cycles because the impulse train with an even M is periodic in two cycles.
+        increment = self.frequency[slots] / self.sample_rate
+        phase = self.phase[slots, np.newaxis] + increment[:, np.newaxis] * np.arange(size)
+        self.phase[slots] = (self.phase[slots] + increment * size) % 2.0
+
+        # Mix all the voices with a single reduction over the voices. When no voice is fading, the gain of
+        # each voice is constant along the block, otherwise the level of the envelope of every voice at every
+        # sample of the block goes linearly towards the target, which can't be crossed
+        waveform = self._waveform(phase, slots)
+        level = self.level[slots, np.newaxis]
+        target = self.target[slots, np.newaxis]
+        if np.array_equal(level, target):
+            out[:] = (self.amplitude[slots] * self.level[slots]) @ waveform
+        else:
+            levels = level + np.sign(target - level) * np.arange(1, size + 1) / self.ramp_size
+            levels = np.clip(levels, np.minimum(level, target), np.maximum(level, target))
+            self.level[slots] = levels[:, -1]
+            out[:] = np.einsum('ij,ij->j', self.amplitude[slots, np.newaxis] * levels, waveform)
+
+        # Voices which finished fading out are released
+        released = slots[(self.level[slots] == 0.0) & (self.target[slots] == 0.0)]
+        if len(released) > 0:
+            self.active[released] = False
+            for frequency in [f for f, slot in self.slots.items() if slot in released]:
+                del self.slots[frequency]
+        return out
+
+    def _waveform(self, phase: np.array, slots: np.array) -> np.array:
+        """ Evaluates the waveform of the given voices.
+            :param phase: Phase of each voice (rows) at each sample (columns), in cycles
+            :param slots: Slots of the voices
+            :return: Waveform of each voice at each sample
+        """
+        if self.waveform == 'square':
+            return np.where(phase % 1.0 < 0.5, 1.0, -1.0)
+        elif self.waveform == 'blit':
+            M = self.harmonics[slots, np.newaxis]
+            P = self.sample_rate / self.frequency[slots, np.newaxis]
+            return (M / P) * sincm(phase, M)
+        else:
+            # Linear interpolation between the two closest samples of the table of each voice. The size of the
+            # tables is a power of two, so the integer position is wrapped with a mask instead of a modulo, and
+            # the samples are gathered from the flattened tables, where each one is followed by its guard sample
+            table_size = self.wavetable.table_size
+            position = phase * table_size
+            index = position.astype(np.intp)
+            fraction = position - index
+            index &= table_size - 1
+            index += self.table[slots, np.newaxis] * (table_size + 1)
+            tables = self.wavetable.tables.reshape(-1)
+            previous = tables.take(index)
+            return previous + (tables.take(index + 1) - previous) * fraction
+
+    def _allocate_slot(self) -> int:
+        """ Finds a free slot for a new voice, or takes the one of the quietest voice if all of them are in use.
+            :return: Index of the slot
+        """
+        free = np.flatnonzero(~self.active)
+        if len(free) > 0:
+            return int(free[0])
+        slot = int(np.argmin(self.level * self.amplitude))
+        for frequency in [f for f, s in self.slots.items() if s == slot]:
+            del self.slots[frequency]
+        return slot
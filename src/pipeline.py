@@ -0,0 +1,244 @@
+# Custom Libraries
+import spectral
+import vocoder
+
+# Third-Party Libraries
+import numpy as np
+import soundfile as sf
+
+# Level reported for silent windows, instead of minus infinity
+LEVEL_FLOOR_DB = -120.0
+
+class VoiceGate:
+
+    def __init__(
+        self,
+        window_size: int,
+        threshold_dB: float = -40,
+        hysteresis_dB: float = 0.0,
+        hold_windows: int = 0,
+        channels: int = 1
+    ):
+        """ Initializes the VoiceGate instance, which scales each window of the excitation by the level of the voice
+            in the same window and mutes it when the voice is silent. The vocoder skips the analysis of the muted
+            windows, so the gate also decides which windows are processed. The gate opens when the level of the
+            voice goes above the threshold, and closes when it falls below the threshold minus the hysteresis,
+            after staying there for the hold time, so short pauses and levels around the threshold don't chop
+            the output. Each channel has its own gate.
+            :param window_size: Size of the windows processed by the vocoder
+            :param threshold_dB: Voice threshold in dB which opens the gate
+            :param hysteresis_dB: Difference between the levels which open and close the gate, in dB
+            :param hold_windows: Number of windows the gate stays open after the level falls below the closing level
+            :param channels: Number of independent voices, each frame has one channel per row
+        """
+        if hysteresis_dB < 0 or hold_windows < 0:
+            raise ValueError('The hysteresis and the hold time can\'t be negative')
+        self.window_size = window_size
+        self.threshold_dB = threshold_dB
+        self.hysteresis_dB = hysteresis_dB
+        self.hold_windows = hold_windows
+        self.channels = channels
+        self.reset()
+
+    def reset(self):
+        """ Closes the gate of every channel.
+        """
+        self.open = np.zeros((self.channels), dtype=bool)
+        self.hold = np.zeros((self.channels), dtype=int)
+
+    def process(self, voice: np.array, excitation: np.array) -> np.array:
+        """ Gates the excitation of a frame. The levels of all the windows are computed at once,
+            and then the state of the gate is followed window by window.
+            :param voice: Voice samples, an integer number of windows. With many channels, one channel per row
+            :param excitation: Excitation samples with the shape of the voice, modified in place
+            :return: Level of the voice in each window, in dB, with one row per channel for many channels
+        """
+        voice_level_dB = self.apply(self.measure(voice), excitation)
+        return voice_level_dB if np.ndim(voice) > 1 else voice_level_dB[0]
+
+    def measure(self, voice: np.array) -> np.array:
+        """ Computes the level of the voice in each window.
+            :param voice: Voice samples, an integer number of windows. With many channels, one channel per row
+            :return: Standard deviation of the voice in each window, with one row per channel
+        """
+        return np.reshape(voice, (self.channels, -1, self.window_size)).std(axis=-1)
+
+    def apply(self, voice_level: np.array, excitation: np.array) -> np.array:
+        """ Gates the excitation of a frame with the levels of the voice measured in its windows, which can
+            also be levels stored from a previous analysis of the voice.
+            :param voice_level: Level of the voice in each window, as returned by measure()
+            :param excitation: Excitation samples, an integer number of windows, modified in place
+            :return: Level of the voice in each window, in dB, with one row per channel
+        """
+        voice_level = np.reshape(voice_level, (self.channels, -1))
+        with np.errstate(divide='ignore'):
+            voice_level_dB = np.maximum(20 * np.log10(voice_level), LEVEL_FLOOR_DB)
+        opening = voice_level_dB > self.threshold_dB
+        sustained = voice_level_dB > self.threshold_dB - self.hysteresis_dB
+        gain = np.zeros(voice_level.shape)
+        for window in range(voice_level.shape[1]):
+            # An open gate is kept open while the level stays above the closing level, then during the hold time
+            kept = self.open & sustained[:, window]
+            held = self.open & ~kept & (self.hold > 0)
+            self.hold = np.where(opening[:, window] | kept, self.hold_windows, self.hold - held)
+            self.open = opening[:, window] | kept | held
+            gain[:, window] = np.where(self.open, voice_level[:, window] * 10, 0.0)
+        excitation_windows = np.reshape(excitation, gain.shape + (self.window_size,))
+        excitation_windows *= gain[..., np.newaxis]
+        return voice_level_dB
+
+# Processing engines which can be selected to vocode the voice
+ENGINES = ('lpc', 'spectral')
+
+# Data types of the samples which can be selected, and the subtype of the files written with each one of them
+PRECISIONS = {'single': np.float32, 'double': np.float64}
+SUBTYPES = {'single': 'FLOAT', 'double': 'DOUBLE'}
+
+def create_vocoder(
+    engine: str,
+    window_size: int,
+    order: int,
+    alpha: float,
+    streaming: bool = False,
+    decimation: int = 1,
+    order_tolerance: float = None,
+    channels: int = 1,
+    precision: str = 'single',
+    hop_size: int = None
+) -> vocoder.Vocoder:
+    """ Creates the vocoder of the selected engine, both of them have the same interface.
+        :param engine: 'lpc' for the time domain Vocoder, or 'spectral' for the frequency domain SpectralVocoder
+        :param window_size: Size of the windows processed by the vocoder
+        :param order: Order of the all-pole model, or number of cepstral coefficients of the envelope
+        :param alpha: Pre-emphasis filter coefficient
+        :param streaming: If true, the LPC vocoder runs in streaming mode
+        :param decimation: Downsampling factor of the voice before the LPC analysis
+        :param order_tolerance: If given, the LPC vocoder chooses the order of each window from its prediction error
+        :param channels: Number of independent voice streams processed by the vocoder
+        :param precision: Precision of the samples, one of PRECISIONS
+        :param hop_size: In streaming mode, number of samples between two models of the LPC vocoder
+        :return: The vocoder
+    """
+    if engine == 'lpc':
+        return vocoder.Vocoder(
+            window_size,
+            order,
+            alpha,
+            streaming=streaming,
+            decimation=decimation,
+            order_tolerance=order_tolerance,
+            channels=channels,
+            dtype=PRECISIONS[precision],
+            hop_size=hop_size
+        )
+    elif engine == 'spectral':
+        if streaming == True or decimation != 1 or order_tolerance is not None or hop_size is not None:
+            raise ValueError('The spectral engine only supports the overlap mode without decimation or adaptive order')
+        return spectral.SpectralVocoder(window_size, order, alpha, channels=channels, dtype=PRECISIONS[precision])
+    raise ValueError(f'Unknown engine {engine}')
+
+def render(
+    voice_path: str,
+    carrier,
+    output_path: str,
+    frame_size: int,
+    window_size: int,
+    order: int,
+    alpha: float,
+    voice_threshold_dB: float = -40,
+    streaming: bool = False,
+    decimation: int = 1,
+    order_tolerance: float = None,
+    engine: str = 'lpc',
+    voice_hysteresis_dB: float = 0.0,
+    voice_hold_windows: int = 0,
+    precision: str = 'single',
+    start: int = 0,
+    stop: int = None
+) -> int:
+    """ Renders the vocoder output of a voice file into a new file, without any audio device. The voice is read,
+        processed and written frame by frame, so long files never have to fit in memory. The output is aligned
+        with the voice, removing the delay of the overlapped windows.
+        Only a segment of the voice can be rendered, producing the same samples as the segment of a complete
+        render. The frame before the segment warms up the state of the vocoder, because in overlap mode the
+        output only depends on the windows around each sample. In streaming mode the synthesis filter depends
+        on the whole past of the signal, so segments aren't allowed there, neither with a gate whose state
+        depends on the past windows through the hysteresis or the hold time.
+        :param voice_path: Path of the voice file, the output has its sampling rate
+        :param carrier: Source of the excitation, any object with a generate_frame(out) method,
+                        and a seek(position) method when rendering a segment
+        :param output_path: Path of the output file, written as float samples of the precision selected
+        :param frame_size: Number of samples read from the files on each step, a multiple of the window size
+        :param window_size: Size of the windows processed by the vocoder
+        :param order: Order of the articulatory filter of the vocoder
+        :param alpha: Pre-emphasis filter coefficient of the vocoder
+        :param voice_threshold_dB: Voice threshold, windows below it are muted
+        :param streaming: If true, the vocoder runs in streaming mode
+        :param decimation: Downsampling factor of the voice before estimating the models
+        :param order_tolerance: If given, the order of each window is chosen from its prediction error curve
+        :param engine: Processing engine, one of ENGINES
+        :param voice_hysteresis_dB: Difference between the levels which open and close the gate of the voice
+        :param voice_hold_windows: Number of windows the gate stays open after the voice falls below the closing level
+        :param precision: Precision of the samples along the processing, one of PRECISIONS
+        :param start: First sample of the segment rendered, a multiple of the frame size
+        :param stop: End of the segment rendered, by default the end of the voice
+        :return: Number of samples written
+    """
+    if frame_size % window_size != 0:
+        raise ValueError('The frame size has to be a multiple of the window size')
+    if start % frame_size != 0:
+        raise ValueError('Segments have to start at the beginning of a frame')
+    if start > 0 and streaming == True:
+        raise ValueError('Segments can only be rendered in overlap mode')
+    if start > 0 and (voice_hysteresis_dB > 0 or voice_hold_windows > 0):
+        raise ValueError('Segments can only be rendered without hysteresis or hold time in the gate')
+
+    v = create_vocoder(
+        engine,
+        window_size,
+        order,
+        alpha,
+        streaming=streaming,
+        decimation=decimation,
+        order_tolerance=order_tolerance,
+        precision=precision
+    )
+    dtype = PRECISIONS[precision]
+    gate = VoiceGate(window_size, voice_threshold_dB, voice_hysteresis_dB, voice_hold_windows)
+    voice_frame = np.zeros((frame_size), dtype=dtype)
+    excitation_frame = np.zeros((frame_size), dtype=dtype)
+    output_frame = np.zeros((frame_size), dtype=dtype)
+
+    with sf.SoundFile(voice_path) as voice_file:
+        buffer = np.zeros((frame_size, voice_file.channels), dtype=dtype)
+
+        def read_frame():
+            count = voice_file.read(out=buffer, always_2d=True).shape[0]
+            buffer[count:] = 0.0
+            np.mean(buffer, axis=1, out=voice_frame)
+            carrier.generate_frame(out=excitation_frame)
+            return gate.process(voice_frame, excitation_frame)
+
+        # The previous frame is processed only to warm up the state of the vocoder
+        if start > 0:
+            voice_file.seek(start - frame_size)
+            carrier.seek(start - frame_size)
+            read_frame()
+            v.process_frames(voice_frame, excitation_frame, out=output_frame)
+
+        # In overlap mode each window is delayed by the vocoder until the next one arrives, so the first window
+        # of the output is dropped and the frames continue after the end of the voice to flush the last one
+        delay = v.latency
+        length = voice_file.frames if stop is None else min(stop, voice_file.frames)
+        length = max(length - start, 0)
+        written = 0
+        with sf.SoundFile(output_path, 'w', samplerate=voice_file.samplerate, channels=1, subtype=SUBTYPES[precision]) as output_file:
+            while written < length:
+                read_frame()
+                v.process_frames(voice_frame, excitation_frame, out=output_frame)
+
+                samples = output_frame[delay:delay + length - written]
+                output_file.write(samples)
+                written += len(samples)
+                delay = 0
+    return written
@@ -0,0 +1,127 @@
+# Third-Party Libraries
+import numpy as np
+
+# Native-Python Libraries
+import threading
+
+class RingBuffer:
+
+    def __init__(self, capacity: int, dtype=np.float32):
+        """ Initializes the RingBuffer instance, a preallocated circular buffer of samples shared by a single
+            producer thread and a single consumer thread without locks. Each index is only written by one of
+            the threads, and it is moved after the samples were copied, so the other thread never sees
+            samples which aren't ready yet.
+            :param capacity: Maximum number of samples stored
+            :param dtype: Data type of the samples
+        """
+        if capacity < 1:
+            raise ValueError('The capacity has to be a positive number')
+        self.capacity = capacity
+        self.buffer = np.zeros((capacity), dtype=dtype)
+        # View of the same memory as raw bytes, to copy audio data coming
+        # from the device without creating a new array for each block
+        self.bytes = memoryview(self.buffer).cast('B')
+
+        # Total number of samples written and read since the creation, the positions
+        # in the buffer are these counts modulo the capacity
+        self.write_count = 0
+        self.read_count = 0
+
+        # Number of writes that didn't fit in the buffer and reads that didn't find enough samples
+        self.overruns = 0
+        self.underruns = 0
+
+        # Set by the producer after each write, so the consumer can sleep until new samples arrive
+        self.ready = threading.Event()
+
+    def reset(self):
+        """ Empties the buffer and clears its counters, only called while neither the producer nor the consumer
+            are using it.
+        """
+        self.write_count = 0
+        self.read_count = 0
+        self.overruns = 0
+        self.underruns = 0
+        self.ready.clear()
+
+    def available(self) -> int:
+        """ Gets the number of samples ready to be read
+            :return: Number of samples
+        """
+        return self.write_count - self.read_count
+
+    def free(self) -> int:
+        """ Gets the number of samples that can be written without overrunning the buffer
+            :return: Number of samples
+        """
+        return self.capacity - (self.write_count - self.read_count)
+
+    def wait(self, count: int, timeout: float = None) -> bool:
+        """ Blocks the consumer until there are enough samples ready to be read, or the timeout expires.
+            :param count: Number of samples needed
+            :param timeout: Maximum time to wait in seconds, or None to wait forever
+            :return: True if the samples are ready, False otherwise
+        """
+        while self.available() < count:
+            # The event is cleared before checking again, so a write happening
+            # in between is never missed and the wait returns immediately
+            self.ready.clear()
+            if self.available() >= count:
+                break
+            if self.ready.wait(timeout) == False:
+                return self.available() >= count
+        return True
+
+    def write(self, samples: np.array) -> int:
+        """ Writes samples into the buffer, only called by the producer. If they don't fit, only the
+            first samples are written and the overrun is counted.
+            :param samples: Samples to write
+            :return: Number of samples written
+        """
+        count = min(len(samples), self.free())
+        if count < len(samples):
+            self.overruns += 1
+        start = self.write_count % self.capacity
+        first = min(count, self.capacity - start)
+        self.buffer[start:start + first] = samples[:first]
+        self.buffer[:count - first] = samples[first:count]
+        self.write_count += count
+        self.ready.set()
+        return count
+
+    def write_bytes(self, data: bytes) -> int:
+        """ Writes raw samples into the buffer, as received from an audio stream, only called by the producer.
+            If they don't fit, only the first samples are written and the overrun is counted.
+            :param data: Bytes of the samples to write, with the data type of the buffer
+            :return: Number of samples written
+        """
+        itemsize = self.buffer.itemsize
+        length = len(data) // itemsize
+        count = min(length, self.free())
+        if count < length:
+            self.overruns += 1
+        start = self.write_count % self.capacity
+        first = min(count, self.capacity - start)
+        data = memoryview(data).cast('B')
+        self.bytes[start * itemsize:(start + first) * itemsize] = data[:first * itemsize]
+        self.bytes[:(count - first) * itemsize] = data[first * itemsize:count * itemsize]
+        self.write_count += count
+        self.ready.set()
+        return count
+
+    def read(self, out: np.array) -> int:
+        """ Reads samples from the buffer, only called by the consumer. If there aren't enough samples,
+            the rest of the output is filled with zeros and the underrun is counted.
+            :param out: Array where the samples are written, its length is the number of samples requested
+            :return: Number of samples read
+        """
+        count = min(len(out), self.available())
+        if count < len(out):
+            self.underruns += 1
+            out[count:] = 0
+        start = self.read_count % self.capacity
+        first = min(count, self.capacity - start)
+        out[:first] = self.buffer[start:start + first]
+        out[first:count] = self.buffer[:count - first]
+        self.read_count += count
+        return count
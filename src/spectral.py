@@ -0,0 +1,113 @@
+# Custom Libraries
+import cache
+import lpc
+import vocoder
+
+# Third-Party Libraries
+import numpy as np
+from scipy import fft
+
+class SpectralVocoder(vocoder.Vocoder):
+
+    def __init__(
+        self,
+        frame_size: int,
+        order: int,
+        alpha: float,
+        flatten_carrier: bool = False,
+        channels: int = 1,
+        dtype=np.float32
+    ):
+        """ Initializes the SpectralVocoder instance, a cross-synthesis vocoder working in the frequency domain.
+            It processes the frames with the same overlapped windows of the Vocoder, but the spectral envelope
+            of each window of the voice is estimated by cepstral smoothing and applied to the spectrum of the
+            excitation, instead of filtering the excitation sample by sample with an all-pole model.
+            :param frame_size: Size of the frames
+            :param order: Number of cepstral coefficients kept in the envelope, as the order of the all-pole
+                          model it sets the detail of the envelope
+            :param alpha: Pre-emphasis filter coefficient
+            :param flatten_carrier: If true, the envelope of the excitation is removed before applying the
+                                    one of the voice, so only the fine structure of the excitation is kept.
+                                    As the all-pole filter, by default the envelope of the voice is applied on
+                                    top of the one of the excitation
+            :param channels: Number of independent voice streams processed together
+            :param dtype: Data type of the samples, np.float32 or np.float64, the transforms are computed with it
+        """
+        if order < 1 or order >= frame_size // 2:
+            raise ValueError('The number of cepstral coefficients has to be between one and half the frame size')
+        self.flatten_carrier = flatten_carrier
+        super().__init__(frame_size, order, alpha, channels=channels, dtype=dtype)
+
+    def process_frames(self, voice: np.array, excitation: np.array, out: np.array = None, models: np.array = None) -> np.array:
+        """ Process a block of consecutive voice frames at once, see Vocoder.process_frames(). The spectral
+            envelopes are always estimated from the voice, the all-pole models of an envelope track don't apply here.
+            :param voice: Contains the voice samples, an integer number of frames
+            :param excitation: Contains the excitation samples, an integer number of frames
+            :param out: Optional array where the output samples are written, with the shape of the voice
+            :param models: Not supported by the spectral engine, has to be None
+            :return: Output samples ready to be reproduced, with the same delay introduced by process_frame()
+        """
+        if models is not None:
+            raise ValueError('The spectral engine can\'t apply the models of an envelope track')
+        return super().process_frames(voice, excitation, out=out)
+
+    def analyze_block(self, voice: np.array) -> np.array:
+        """ The spectral engine doesn't estimate all-pole models, so it can't analyze envelope tracks.
+        """
+        raise ValueError('The spectral engine can\'t analyze envelope tracks')
+
+    def vocode_frame(self, voice_frame: np.array, excitation_frame: np.array, order: int, alpha: float = 0.97, **options) -> np.array:
+        """ Applies the spectral envelope of one window of the voice to the same window of the excitation.
+            :param voice_frame: Voice samples
+            :param excitation_frame: Excitation samples
+            :param order: Number of cepstral coefficients kept in the envelope
+            :param alpha: Pre-emphasis high-pass filter coefficient, None if the voice is already pre-emphasized
+            :param options: Options of the time domain vocoder, which don't apply here
+            :return: The vocoded window
+        """
+        return self.vocode_frames(voice_frame[np.newaxis], excitation_frame[np.newaxis], order, alpha)[0]
+
+    def vocode_frames(self, voice_frames: np.array, excitation_frames: np.array, order: int, alpha: float = 0.97, **options) -> np.array:
+        """ Applies the spectral envelope of a batch of windows of the voice to the windows of the excitation.
+            :param voice_frames: Voice samples, one window per row
+            :param excitation_frames: Excitation samples, one window per row
+            :param order: Number of cepstral coefficients kept in the envelope
+            :param alpha: Pre-emphasis high-pass filter coefficient, None if the voice is already pre-emphasized
+            :param options: Options of the time domain vocoder, which don't apply here
+            :return: The vocoded windows, one window per row, with the data type of the excitation (at least single precision)
+        """
+        # Verify if both the voice and the excitation frames have the same shape
+        if np.shape(voice_frames) != np.shape(excitation_frames):
+            raise ValueError('Voice and excitation frames must have the same shape')
+
+        # Get the frame size, the window has the data type of the excitation so the
+        # transforms are computed in single precision for single precision frames
+        frame_size = voice_frames.shape[-1]
+        dtype = np.result_type(excitation_frames, np.float32)
+        window = cache.get_window('hann', frame_size, dtype=dtype)
+
+        # Spectra of the pre-emphasized voice and of the excitation, both of them windowed before the FFT
+        voice_frames = voice_frames.astype(dtype, copy=False)
+        if alpha is not None:
+            voice_frames = lpc.preemphasis(voice_frames, alpha)
+        voice_spectrum = fft.rfft(voice_frames * window, axis=-1)
+        excitation_spectrum = fft.rfft(excitation_frames * window, axis=-1)
+
+        # The real cepstrum of each window is the inverse transform of its log-magnitude spectrum, and the envelope
+        # is described by the coefficients of the lowest quefrencies. The coefficient zero is the mean level of the
+        # log-magnitude, which is left out so the envelope has a unit geometric mean like the all-pole models.
+        # The envelope of the excitation is subtracted in the cepstral domain, and the result is transformed once
+        cepstrum = fft.irfft(self._log_magnitude(voice_spectrum), n=frame_size, axis=-1)
+        if self.flatten_carrier == True:
+            cepstrum -= fft.irfft(self._log_magnitude(excitation_spectrum), n=frame_size, axis=-1)
+        cepstrum[:, 0] = 0.0
+        cepstrum[:, order + 1:frame_size - order] = 0.0
+        envelope = np.exp(fft.rfft(cepstrum, axis=-1).real)
+
+        return fft.irfft(excitation_spectrum * envelope, n=frame_size, axis=-1)
+
+    @staticmethod
+    def _log_magnitude(spectrum: np.array) -> np.array:
+        """ Computes the logarithm of the magnitude of a spectrum, with a floor for the null bins.
+        """
+        return np.log(np.abs(spectrum) + 1.0e-12)
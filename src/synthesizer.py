@@ -1,104 +1,161 @@
+# Custom Libraries
+import oscillator
+import wavetable as wavetables
+
 # Third-Party Libraries
-from scipy import signal
 import numpy as np
 
 # Native-Python Libraries
 
+# Waveforms which can be selected for the synthesizer, 'table' is the bandlimited impulse train read from the
+# precomputed wavetables, the cheapest bandlimited waveform to render, and 'saw' a sawtooth read from them too
+WAVEFORMS = ('square', 'blit', 'table', 'saw')
+
 class Synthesizer:
 
-    def __init__(self, frame_size: int, sample_rate: int, squarewave: bool=True):
+    def __init__(
+        self,
+        frame_size: int,
+        sample_rate: int,
+        squarewave: bool=True,
+        wavetable: bool=False,
+        wavetable_directory: str=None,
+        table_waveform: str=None,
+        dtype=np.float32
+    ):
         """ Initializes the Synthesizer instance
             :param frame_size: Size of the frames
             :param sample_rate: Sampling rate
+            :param squarewave: If true, a square wave is generated, otherwise a bandlimited impulse train (BLIT)
+            :param wavetable: If true, the waveform is read from precomputed bandlimited wavetables
+            :param wavetable_directory: Optional directory where the wavetables are stored and memory-mapped from
+            :param table_waveform: Waveform of the wavetables, as accepted by oscillator.bandlimited_table(),
+                                   by default the square wave or the impulse train selected with squarewave
+            :param dtype: Data type of the frames generated, the phases of the oscillators are kept in double precision
         """
         # Initialization of internal parameters
         self.frame_size = frame_size
         self.sample_rate = sample_rate
         self.step_size = int(0.5 * frame_size)
-        self.step_index = 0
 
-        # Buffer instantiation
-        self.frames = np.zeros((frame_size * 3), dtype=np.float32)
+        # The frames are rendered just in time, when they are requested, so the notes played before a frame
+        # is requested are heard in it. The notes scheduled inside the next frame wait here sorted by their
+        # offset, as (offset, amplitude, frequency) tuples where note off events have no amplitude
+        self.dtype = dtype
+        self.events = []
 
         self.notes_playing = dict()
 
         self.squarewave = squarewave
+        self.wavetable = wavetable
+
+        # All the notes are rendered by a bank of oscillators that keeps their phases, the notes
+        # fade in and out along half a frame, as they did with the overlapped Hann windows
+        waveform = 'square' if squarewave else 'blit'
+        tables = None
+        if wavetable:
+            tables = wavetables.Wavetable(table_waveform or waveform, sample_rate, directory=wavetable_directory)
+            waveform = 'table'
+        self.oscillators = oscillator.OscillatorBank(
+            sample_rate,
+            waveform=waveform,
+            wavetable=tables,
+            ramp_size=self.step_size
+        )
     
-    def note_on(self, amplitude: float, frequency: float):
+    def note_on(self, amplitude: float, frequency: float, offset: int = None):
         """ Adds a new note to the dictionary of currently playing notes
             :param amplitude: Amplitude of the waveform
             :param frequency: Fundamental frequency of the waveform
+            :param offset: Optional sample of the next frame where the note starts, otherwise it starts right away
         """
         if amplitude < 0.0:
             raise ValueError('The amplitude has to be a positive number')
-        if frequency < 0.0:
-            raise ValueError('Invalid negative frequency value')
         frequency = round(frequency, 3)     # Round float to get reliable comparisons
+        if frequency <= 0.0:
+            raise ValueError('The frequency has to be a positive number')
+        if offset is not None:
+            self._schedule(offset, amplitude, frequency)
+            return
         self.notes_playing[frequency] = amplitude
+        self.oscillators.note_on(amplitude, frequency)
     
-    def note_off(self, frequency: float) -> bool:
+    def note_off(self, frequency: float, offset: int = None) -> bool:
         """ Removes note from the dictionary of currently playing notes
             :param frequency: Fundamental frequency of the waveform
-            :return: True if value was succesfully removed, False otherwise
+            :param offset: Optional sample of the next frame where the note stops, otherwise it stops right away
+            :return: True if value was succesfully removed, False otherwise. With an offset, True if the note
+                     is playing or scheduled when the note off is scheduled
         """
-        if frequency < 0.0:
-            raise ValueError('Invalid negative frequency value')
         frequency = round(frequency, 3)     # Round float to get reliable comparisons
+        if frequency <= 0.0:
+            raise ValueError('The frequency has to be a positive number')
+        if offset is not None:
+            self._schedule(offset, None, frequency)
+            return frequency in self.notes_playing or any(event[2] == frequency for event in self.events)
         result = self.notes_playing.pop(frequency, None)
+        self.oscillators.note_off(frequency)
         return result != None
 
-    def SincM(self, x, M):
-        """ SincM function from: https://ccrma.stanford.edu/~stilti/papers/blit.pdf
-            :param x: Array of x values
-            :param M: Number of harmonics to preserve
-            :return: Array containing the resulting waveform
+    def _schedule(self, offset: int, amplitude: float, frequency: float):
+        """ Schedules a note event inside the next frame, after the events scheduled at the same offset.
         """
-        sincm = lambda x: np.sin(np.pi*x) / (M * np.sin(np.pi*x / M))
-        return np.where( abs(np.sin(np.pi*x/M)) <= 1.0e-12, 1, sincm(x) )
+        if offset < 0 or offset >= self.frame_size:
+            raise ValueError('The offset has to be inside the frame')
+        position = len(self.events)
+        while position > 0 and self.events[position - 1][0] > offset:
+            position -= 1
+        self.events.insert(position, (offset, amplitude, frequency))
 
-    def generate_waveform(self, time: np.array) -> np.array:
-        """ Generates a waveform from the currently playing notes at the specified times
-            :param time: Array of time samples
-            :return: Array containing the resulting waveform
-        """
-        waveform = np.zeros_like(time)
-        for freq, amp in self.notes_playing.items():
-            if self.squarewave:
-                waveform += amp * signal.square(2 * np.pi * freq * time)
-            else:
-                P = self.sample_rate / freq
-                M = 2 * P//2 - 1
-                waveform += amp * (M/P)*self.SincM((M/P) * (time * self.sample_rate), M)
-        return waveform
-    
-    def generate_frame(self):
-        """ Generates a new frame of the synthesized waveform
+    def generate_frame(self, out: np.array = None) -> np.array:
+        """ Generates a new frame of the synthesized waveform, playing the notes scheduled inside it
+            :param out: Optional array where the frame is written, otherwise a new array is returned
+            :return: The generated frame
         """
-        # The internal buffer named self.frames can contain up to three frames
-        # [ f(n) | f(n+1) | f(n+2) ]. Each time the generate_frame() method is called
-        # the f(n) frame is already ready to be consumed. The f(n+1) preparation is finished
-        # for the next generation instant, while the f(n+2) preparation starts.
-        generated_frame = np.copy(self.frames[:self.frame_size])
+        if out is None:
+            out = np.zeros((self.frame_size), dtype=self.dtype)
 
-        # After creating a copy for the frame consumed, the buffer is shifted
-        # to the left and cleaned to put the next frame to be consumed in place
-        self.frames = np.roll(self.frames, -self.frame_size)
-        self.frames[self.frame_size * 2:] = np.zeros((self.frame_size), dtype=np.float32)
-
-        # Generates the overlapping samples of the waveform
-        t = self._get_next_frame_time()
-        self.frames[self.frame_size // 2 + self.frame_size : self.frame_size // 2 + self.frame_size * 2] += self.generate_waveform(t) * signal.windows.hann(self.frame_size)
-
-        # Generates the non-overlapping samples of the new frame
-        t = self._get_next_frame_time()
-        self.frames[self.frame_size * 2:] += self.generate_waveform(t) * signal.windows.hann(self.frame_size)
+        # The frame is rendered in segments between the offsets of the notes scheduled inside it, each
+        # sample is computed once because the oscillators continue the phase of every note from the
+        # previous segment, and the envelope of the notes starts or stops at the sample of the event
+        start = 0
+        for offset, amplitude, frequency in self.events:
+            if offset > start:
+                self.oscillators.render(offset - start, out=out[start:offset])
+                start = offset
+            if amplitude is None:
+                self.note_off(frequency)
+            else:
+                self.note_on(amplitude, frequency)
+        self.events.clear()
+        self.oscillators.render(self.frame_size - start, out=out[start:])
 
         # Return the generated frame
-        return generated_frame
-    
-    def _get_next_frame_time(self):
-        """ Get the time interval for the next frame to be generated
-        """
-        excitation_time = np.arange(self.frame_size) / self.sample_rate + self.step_index * self.step_size / self.sample_rate
-        self.step_index = self.step_index + 1
-        return excitation_time
+        return out
+
+def create_synthesizer(
+    frame_size: int,
+    sample_rate: int,
+    waveform: str = 'square',
+    wavetable_directory: str = None,
+    dtype=np.float32
+) -> Synthesizer:
+    """ Creates the synthesizer of the selected waveform.
+        :param frame_size: Size of the frames
+        :param sample_rate: Sampling rate
+        :param waveform: One of WAVEFORMS
+        :param wavetable_directory: Optional directory where the wavetables are stored and memory-mapped from
+        :param dtype: Data type of the frames generated
+        :return: The synthesizer
+    """
+    if waveform not in WAVEFORMS:
+        raise ValueError(f'Unknown waveform {waveform}')
+    return Synthesizer(
+        frame_size,
+        sample_rate,
+        squarewave=waveform == 'square',
+        wavetable=waveform in ('table', 'saw'),
+        wavetable_directory=wavetable_directory,
+        table_waveform='saw' if waveform == 'saw' else None,
+        dtype=dtype
+    )
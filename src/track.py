@@ -0,0 +1,271 @@
+# Custom Libraries
+import pipeline
+import vocoder
+
+# Third-Party Libraries
+import numpy as np
+import soundfile as sf
+
+# Native-Python Libraries
+import json
+
+# Identifies the envelope track files, the header follows it
+TRACK_MAGIC = b'VOCTRACK'
+
+# The data starts at a multiple of this number of bytes, so the memory-mapped rows are aligned
+TRACK_ALIGNMENT = 64
+
+# Formats in which the reflection coefficients can be stored, with the data type of each one. The quantized
+# format stores the arcsine of each coefficient as a 16-bit integer, finer near the magnitudes close to one
+# where the response of the filter is most sensitive, with a smaller error than half precision floats
+TRACK_PRECISIONS = {'quantized': np.int16, 'single': np.float32}
+QUANTIZATION_STEPS = 32767
+
+class EnvelopeTrack:
+
+    def __init__(self, path: str):
+        """ Opens an envelope track, the models of the voice estimated by analyze() for each window. The file has
+            a header with the parameters of the analysis, followed by the level of the voice in each frame and
+            then by the reflection coefficients of the models of the windows of each frame. Both of them are
+            memory-mapped, so only the frames used are read from the file.
+            :param path: Path of the envelope track
+        """
+        with open(path, 'rb') as file:
+            if file.read(len(TRACK_MAGIC)) != TRACK_MAGIC:
+                raise ValueError(f'{path} is not an envelope track')
+            header_size = int.from_bytes(file.read(4), 'little')
+            header = json.loads(file.read(header_size))
+        self.sample_rate = header['sample_rate']
+        self.window_size = header['window_size']
+        self.order = header['order']
+        self.alpha = header['alpha']
+        self.streaming = header['streaming']
+        self.decimation = header['decimation']
+        self.order_tolerance = header['order_tolerance']
+        self.length = header['length']
+        self.precision = header['precision']
+        self.frames = header['frames']
+        offset = len(TRACK_MAGIC) + 4 + header_size
+        self.levels = np.memmap(path, dtype=np.float32, mode='r', offset=offset, shape=(self.frames))
+        self.coefficients = np.memmap(
+            path,
+            dtype=TRACK_PRECISIONS[self.precision],
+            mode='r',
+            offset=offset + _aligned(self.levels.nbytes),
+            shape=(self.frames, 1 if self.streaming == True else 2, header['model_order'])
+        )
+
+    def models(self, start: int, stop: int) -> np.array:
+        """ Reads the models of some frames of the track.
+            :param start: First frame read
+            :param stop: End of the frames read
+            :return: Reflection coefficients of the models with shape (frames, windows, order), as returned
+                     by Vocoder.analyze_block() for a single channel, the windows of each frame are the
+                     overlapped and the current ones, or a single one in streaming mode
+        """
+        return decode(self.coefficients[start:stop], self.precision)
+
+    def create_vocoder(self, precision: str = 'single') -> vocoder.Vocoder:
+        """ Creates a vocoder with the parameters of the analysis, which applies the models of the track.
+            :param precision: Precision of the samples, one of pipeline.PRECISIONS
+            :return: The vocoder
+        """
+        return pipeline.create_vocoder(
+            'lpc',
+            self.window_size,
+            self.order,
+            self.alpha,
+            streaming=self.streaming,
+            decimation=self.decimation,
+            order_tolerance=self.order_tolerance,
+            precision=precision
+        )
+
+def encode(k: np.array, precision: str) -> np.array:
+    """ Converts reflection coefficients into the format they are stored with.
+        :param k: Reflection coefficients, inside (-1, 1)
+        :param precision: Storage format, one of TRACK_PRECISIONS
+        :return: Coefficients stored
+    """
+    if precision == 'quantized':
+        # The largest code is never used, it would give a coefficient of one and an unstable filter
+        codes = np.round(np.arcsin(k) * (2 / np.pi) * QUANTIZATION_STEPS)
+        return np.clip(codes, 1 - QUANTIZATION_STEPS, QUANTIZATION_STEPS - 1).astype(np.int16)
+    return np.asarray(k, dtype=TRACK_PRECISIONS[precision])
+
+def decode(coefficients: np.array, precision: str) -> np.array:
+    """ Converts the coefficients stored back into reflection coefficients, the inverse of encode().
+        :param coefficients: Coefficients stored
+        :param precision: Storage format, one of TRACK_PRECISIONS
+        :return: Reflection coefficients, in double precision
+    """
+    if precision == 'quantized':
+        return np.sin(coefficients * (np.pi / 2 / QUANTIZATION_STEPS))
+    return np.asarray(coefficients, dtype=np.float64)
+
+def _aligned(size: int) -> int:
+    """ Rounds a number of bytes up to a multiple of TRACK_ALIGNMENT.
+    """
+    return -(-size // TRACK_ALIGNMENT) * TRACK_ALIGNMENT
+
+def analyze(
+    voice_path: str,
+    track_path: str,
+    window_size: int,
+    order: int,
+    alpha: float,
+    streaming: bool = False,
+    decimation: int = 1,
+    order_tolerance: float = None,
+    precision: str = 'quantized',
+    block_size: int = 256
+) -> int:
+    """ Analyzes a voice file once and stores its envelope track, which render() applies to any carrier without
+        analyzing the voice again. The models are the ones the Vocoder estimates while rendering the voice, and
+        they are stored as reflection coefficients, which keep every filter stable after rounding them.
+        The track is written through a memory mapping, one block of frames at a time.
+        :param voice_path: Path of the voice file, many channels are mixed down as in pipeline.render()
+        :param track_path: Path of the envelope track written
+        :param window_size: Size of the windows processed by the vocoder
+        :param order: Order of the articulatory filter of the vocoder
+        :param alpha: Pre-emphasis filter coefficient of the vocoder
+        :param streaming: If true, the models are estimated for the streaming mode, one per window
+        :param decimation: Downsampling factor of the voice before estimating the models
+        :param order_tolerance: If given, the order of each window is chosen from its prediction error curve
+        :param precision: Storage format of the coefficients, one of TRACK_PRECISIONS
+        :param block_size: Number of frames analyzed on each step
+        :return: Number of frames of the track
+    """
+    v = vocoder.Vocoder(
+        window_size,
+        order,
+        alpha,
+        streaming=streaming,
+        decimation=decimation,
+        order_tolerance=order_tolerance
+    )
+    gate = pipeline.VoiceGate(window_size)
+    model_shape = (1 if streaming == True else 2, v.reflection.shape[1])
+
+    with sf.SoundFile(voice_path) as voice_file:
+        length = voice_file.frames
+        frames = -(-length // window_size) + (0 if streaming == True else 1)
+        header = json.dumps({
+            'sample_rate': voice_file.samplerate,
+            'window_size': window_size,
+            'order': order,
+            'alpha': alpha,
+            'streaming': streaming,
+            'decimation': decimation,
+            'order_tolerance': order_tolerance,
+            'length': length,
+            'frames': frames,
+            'model_order': model_shape[1],
+            'precision': precision
+        }).encode()
+        header += b' ' * (_aligned(len(TRACK_MAGIC) + 4 + len(header)) - len(TRACK_MAGIC) - 4 - len(header))
+        offset = len(TRACK_MAGIC) + 4 + len(header)
+        with open(track_path, 'wb') as track_file:
+            track_file.write(TRACK_MAGIC + len(header).to_bytes(4, 'little') + header)
+            track_file.truncate(offset + _aligned(frames * 4) + frames * np.prod(model_shape) * np.dtype(TRACK_PRECISIONS[precision]).itemsize)
+        levels = np.memmap(track_path, dtype=np.float32, mode='r+', offset=offset, shape=(frames))
+        coefficients = np.memmap(
+            track_path,
+            dtype=TRACK_PRECISIONS[precision],
+            mode='r+',
+            offset=offset + _aligned(levels.nbytes),
+            shape=(frames,) + model_shape
+        )
+
+        buffer = np.zeros((block_size * window_size, voice_file.channels), dtype=np.float32)
+        for start in range(0, frames, block_size):
+            # The frames after the end of the voice are silent
+            count = voice_file.read(out=buffer, always_2d=True).shape[0]
+            buffer[count:] = 0.0
+            block = np.mean(buffer[:min(block_size, frames - start) * window_size], axis=1)
+            stop = start + len(block) // window_size
+            levels[start:stop] = gate.measure(block)[0]
+            coefficients[start:stop] = encode(v.analyze_block(block)[0], precision)
+        levels.flush()
+        coefficients.flush()
+    return frames
+
+def render(
+    track_path: str,
+    carrier,
+    output_path: str,
+    frame_size: int,
+    voice_threshold_dB: float = -40,
+    voice_hysteresis_dB: float = 0.0,
+    voice_hold_windows: int = 0,
+    precision: str = 'single',
+    start: int = 0,
+    stop: int = None
+) -> int:
+    """ Renders the vocoder output of an envelope track with a carrier into a new file, as pipeline.render()
+        does with the voice file analyzed, but without analyzing the voice. The gate follows the levels of the
+        voice stored in the track, and the segments have the same restrictions.
+        :param track_path: Path of the envelope track, the output has the sampling rate of the voice analyzed
+        :param carrier: Source of the excitation, any object with a generate_frame(out) method,
+                        and a seek(position) method when rendering a segment
+        :param output_path: Path of the output file, written as float samples of the precision selected
+        :param frame_size: Number of samples read from the carrier on each step, a multiple of the window size
+        :param voice_threshold_dB: Voice threshold, windows below it are muted
+        :param voice_hysteresis_dB: Difference between the levels which open and close the gate of the voice
+        :param voice_hold_windows: Number of windows the gate stays open after the voice falls below the closing level
+        :param precision: Precision of the samples along the processing, one of pipeline.PRECISIONS
+        :param start: First sample of the segment rendered, a multiple of the frame size
+        :param stop: End of the segment rendered, by default the end of the voice
+        :return: Number of samples written
+    """
+    envelope = EnvelopeTrack(track_path)
+    window_size = envelope.window_size
+    if frame_size % window_size != 0:
+        raise ValueError('The frame size has to be a multiple of the window size of the track')
+    if start % frame_size != 0:
+        raise ValueError('Segments have to start at the beginning of a frame')
+    if start > 0 and envelope.streaming == True:
+        raise ValueError('Segments can only be rendered in overlap mode')
+    if start > 0 and (voice_hysteresis_dB > 0 or voice_hold_windows > 0):
+        raise ValueError('Segments can only be rendered without hysteresis or hold time in the gate')
+
+    v = envelope.create_vocoder(precision)
+    dtype = pipeline.PRECISIONS[precision]
+    gate = pipeline.VoiceGate(window_size, voice_threshold_dB, voice_hysteresis_dB, voice_hold_windows)
+    window_count = frame_size // window_size
+    levels = np.zeros((window_count), dtype=np.float32)
+    models = np.zeros((window_count,) + envelope.coefficients.shape[1:])
+    excitation_frame = np.zeros((frame_size), dtype=dtype)
+    output_frame = np.zeros((frame_size), dtype=dtype)
+
+    def read_frame(index: int):
+        # The frames after the end of the track are silent
+        count = max(min(window_count, envelope.frames - index), 0)
+        levels[:count] = envelope.levels[index:index + count]
+        levels[count:] = 0.0
+        models[:count] = envelope.models(index, index + count)
+        models[count:] = 0.0
+        carrier.generate_frame(out=excitation_frame)
+        gate.apply(levels, excitation_frame)
+        v.process_frames(None, excitation_frame, out=output_frame, models=models)
+
+    # The previous frame is processed only to warm up the state of the vocoder
+    if start > 0:
+        carrier.seek(start - frame_size)
+        read_frame((start - frame_size) // window_size)
+
+    # The delay of the overlap mode is removed as in pipeline.render()
+    delay = v.latency
+    length = envelope.length if stop is None else min(stop, envelope.length)
+    length = max(length - start, 0)
+    written = 0
+    index = start // window_size
+    with sf.SoundFile(output_path, 'w', samplerate=envelope.sample_rate, channels=1, subtype=pipeline.SUBTYPES[precision]) as output_file:
+        while written < length:
+            read_frame(index)
+            index += window_count
+            samples = output_frame[delay:delay + length - written]
+            output_file.write(samples)
+            written += len(samples)
+            delay = 0
+    return written
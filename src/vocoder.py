@@ -1,76 +1,451 @@
+# Custom Libraries
+import cache
+import kernels
+import lpc
+
 # Third-Party Libraries
 import numpy as np
-from scipy import signal
-from statsmodels.tsa import stattools
-import librosa
+
+# Native-Python Libraries
+import copy
+
+# Level below which the tail of the synthesis filter is considered silent, about -180 dB
+SILENCE_LEVEL = 1e-9
 
 class Vocoder:
 
-    def __init__(self, frame_size: int, order: int, alpha: float):
+    def __init__(
+        self,
+        frame_size: int,
+        order: int,
+        alpha: float,
+        fast_correlation: bool = True,
+        streaming: bool = False,
+        interpolation_steps: int = 4,
+        decimation: int = 1,
+        order_tolerance: float = None,
+        channels: int = 1,
+        dtype=np.float32,
+        hop_size: int = None
+    ):
         """ Initializes the Vocoder instance.
             :param frame_size: Size of the frames
             :param order: Order of the articulatory filter whose parameters will be estimated
-            :param alpha: Pre-emphasis filter coefficient
+            :param alpha: Pre-emphasis filter coefficient, the filter runs continuously over the voice
+            :param fast_correlation: If true, only the lags needed by the model are computed in the autocorrelation
+            :param streaming: If true, frames are processed without overlap by a synthesis filter whose state
+                              is kept from one frame to the next one, instead of overlapping windows
+            :param interpolation_steps: Number of segments of each frame in streaming mode, the filter coefficients
+                                        are interpolated from the previous frame model to the new one along them
+            :param decimation: Downsampling factor of the voice before estimating the model, the vocal tract
+                               envelope lives in the lower band, so a model of order / decimation is estimated
+                               there and mapped back to the sampling rate of the excitation
+            :param order_tolerance: If given, the order of each window is the lowest one whose prediction error
+                                    exceeds the error of the highest order by less than this relative tolerance
+            :param channels: Number of independent voice streams processed together, each one with its own state.
+                             With many channels, the frames are arrays with one channel per row
+            :param dtype: Data type of the samples, np.float32 or np.float64. The buffers, the synthesis filters,
+                          the windows and the output use it, frames of other types are converted when received
+            :param hop_size: In streaming mode, number of samples between two models, which can be less than the
+                             frame size. Each model is estimated from the last frame_size samples of the voice, so
+                             the frames received are blocks of hop_size samples which don't wait for a whole window
         """
+        if np.dtype(dtype) not in (np.float32, np.float64):
+            raise ValueError('The samples have to be either np.float32 or np.float64')
+        if channels < 1:
+            raise ValueError('At least one channel is needed')
+        if interpolation_steps < 1:
+            raise ValueError('At least one interpolation step is needed')
+        if decimation < 1:
+            raise ValueError('The decimation factor has to be a positive integer')
+        if hop_size is not None and hop_size != frame_size:
+            if streaming == False:
+                raise ValueError('The hop size can only be changed in streaming mode')
+            if hop_size < 1 or hop_size > frame_size:
+                raise ValueError('The hop size has to be between one sample and the frame size')
+
         # Save the parameters of the vocoder
         self.frame_size = frame_size
         self.order = order
         self.alpha = alpha
-        # Stores the previous input window and has space to insert the new window 
-        # to simplify how the math is taken during the processing (when the overlapped
-        # window is needed)
-        self.x = np.zeros((frame_size * 2), dtype=np.float32)
+        self.fast_correlation = fast_correlation
+        self.streaming = streaming
+        self.interpolation_steps = interpolation_steps
+        self.decimation = decimation
+        self.order_tolerance = order_tolerance
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        self.hop_size = frame_size if hop_size is None else hop_size
+        self.reset()
+
+    @property
+    def latency(self) -> int:
+        """ Number of samples the output is delayed from the input by the algorithm, in overlap mode each
+            frame is ready when the next one arrives, because the overlapped window needs both of them.
+        """
+        return 0 if self.streaming == True else self.frame_size
+
+    def reset(self):
+        """ Clears the state kept from the previous frames, as if no frame had been processed yet.
+        """
+        frame_size = self.frame_size
+        # In streaming mode, stores the reflection coefficients of the last model estimated
+        # and the last outputs of the synthesis filter, starting from the most recent one
+        model_order = lpc.decimated_order(self.order, self.decimation)
+        self.reflection = np.zeros((self.channels, model_order))
+        self.history = np.zeros((self.channels, model_order))
+        # In streaming mode with a hop shorter than the frame, stores the pre-emphasized voice preceding the
+        # new block which is needed to complete the window of its first model
+        self.window = np.zeros((self.channels, frame_size - self.hop_size), dtype=self.dtype)
+        # Stores the previous input frame and the new one in a circular buffer of two slots,
+        # the slot holding the newest frame is indicated by self.index. After the two slots,
+        # the buffer keeps a mirror of the first half of the slot zero, so the overlapped window
+        # [ x(n-1) second half | x(n) first half ] is always a contiguous view of the buffer,
+        # no matter which slot holds the newest frame. Each channel has its own buffer in a row
+        self.index = 1
+        self.x = np.zeros((self.channels, frame_size * 2 + frame_size // 2), dtype=self.dtype)
         # Stores the data being fed to the output and data being written by 
-        # the processing algorithm with the new input data
-        self.y = np.zeros((frame_size * 2), dtype=np.float32)
-        # Store the excitation samples
-        self.excitation = np.zeros((frame_size * 2), dtype=np.float32)
+        # the processing algorithm with the new input data, using the same two slots
+        self.y = np.zeros((self.channels, frame_size * 2), dtype=self.dtype)
+        # Store the excitation samples, with the same layout used for the input samples
+        self.excitation = np.zeros((self.channels, frame_size * 2 + frame_size // 2), dtype=self.dtype)
+        # The voice is stored pre-emphasized, filtering each sample once when it arrives instead of filtering
+        # each window, and the last voice sample received continues the filter with the next frame
+        self.last_voice = np.zeros((self.channels), dtype=self.dtype)
 
-    def process_frame(self, voice_frame: np.array, excitation_frame: np.array) -> np.array:
+    def process_frame(self, voice_frame: np.array, excitation_frame: np.array, out: np.array = None) -> np.array:
         """ Process a new voice frame.
             :param voice_frame: Contains the voice samples
             :param excitation_frame: Contains the frame_samples
+            :param out: Optional array where the output samples are written, otherwise the returned
+                        array is a view of the internal buffer, only valid until the next call
             :return: Output samples ready to be reproduced
         """
-        # In self.x we have an array with space for two frames -> [ FRAME_SIZE | FRAME_SIZE ]
-        # and its status to this point is [ x(n-2) | x(n-1) ]. So, first the data is shifted to
-        # the left and replaced with the new data. Finally, we have [ x(n-1) | x(n) ]. The time
-        # isn't the sampling time, it's the framing time.
+        if self.streaming == True or self.channels > 1:
+            return self.process_frames(voice_frame, excitation_frame, out)
+        x, y, excitation = self.x[0], self.y[0], self.excitation[0]
+
+        # The circular buffers have two slots, at this point the slot self.index has x(n-1) and the other
+        # one has x(n-2), which is replaced with the new data. Finally, we have x(n-1) in the previous slot
+        # and x(n) in the current one. The time isn't the sampling time, it's the framing time.
         # Why do we need this? When we use 50% overlap, each incoming data window has to be used 
         # (at least part of its data) three times. You'll process a segment which overlaps with 
         # the previous window, a segment which has no overlap (uses only this window) and a segment
         # which overlaps with the future window.
-        self.x = np.roll(self.x, -self.frame_size)
-        self.x[self.frame_size:] = voice_frame
-        self.excitation = np.roll(self.excitation, -self.frame_size)
-        self.excitation[self.frame_size:] = excitation_frame
+        # Moving the index instead of shifting the data with np.roll() avoids allocating new buffers
+        # on each processing cycle.
+        half_size = self.frame_size // 2
+        previous = self.index * self.frame_size
+        self.index = 1 - self.index
+        current = self.index * self.frame_size
+        x[current:current + self.frame_size] = self._emphasize(voice_frame[np.newaxis])[0]
+        excitation[current:current + self.frame_size] = excitation_frame
+        if current == 0:
+            x[self.frame_size * 2:] = x[:half_size]
+            excitation[self.frame_size * 2:] = excitation[:half_size]
         
-        # In self.y we have an array with space for two frames -> [ FRAME_SIZE | FRAME_SIZE ]
-        # and its status to this point is [ y(n-1) : y(n) ]. In this processing cycle we start
+        # In self.y the previous slot has y(n-1) and the current one is cleared to start
         # working on y(n) which won't be ready until the next cycle (always one cycle of delay
         # due to real-time limitations).
-        self.y = np.roll(self.y, -self.frame_size)
-        self.y[self.frame_size:] = np.zeros((self.frame_size))
+        y[current:current + self.frame_size] = 0.0
 
-        # Process the overlapped segment using the previous window
-        self.y[self.frame_size // 2:self.frame_size // 2 + self.frame_size] += self.vocode_frame(
-            self.x[self.frame_size // 2:self.frame_size // 2 + self.frame_size],
-            self.excitation[self.frame_size // 2:self.frame_size // 2 + self.frame_size],
-            self.order,
-            self.alpha
-        )
+        # Process the overlapped segment using the previous window, its output
+        # is split between the end of y(n-1) and the beginning of y(n).
+        # A window with a muted excitation produces silence, so its analysis is skipped
+        overlapped_excitation = excitation[previous + half_size:previous + half_size + self.frame_size]
+        if np.any(overlapped_excitation):
+            y_frame = self.vocode_frame(
+                x[previous + half_size:previous + half_size + self.frame_size],
+                overlapped_excitation,
+                self.order,
+                None,
+                fast_correlation=self.fast_correlation,
+                decimation=self.decimation,
+                order_tolerance=self.order_tolerance
+            )
+            y[previous + half_size:previous + self.frame_size] += y_frame[:self.frame_size - half_size]
+            y[current:current + half_size] += y_frame[self.frame_size - half_size:]
 
         # Process the current window
-        self.y[self.frame_size:] += self.vocode_frame(
-            self.x[self.frame_size:],
-            self.excitation[self.frame_size:],
-            self.order,
-            self.alpha
-        )
+        if np.any(excitation[current:current + self.frame_size]):
+            y[current:current + self.frame_size] += self.vocode_frame(
+                x[current:current + self.frame_size],
+                excitation[current:current + self.frame_size],
+                self.order,
+                None,
+                fast_correlation=self.fast_correlation,
+                decimation=self.decimation,
+                order_tolerance=self.order_tolerance
+            )
 
         # Return the frame that is ready after this processing cycle
         # and the external user may decide when to use it (to synchronize or not)
-        return self.y[:self.frame_size]
+        if out is None:
+            return y[previous:previous + self.frame_size]
+        out[:] = y[previous:previous + self.frame_size]
+        return out
+
+    def process_frames(self, voice: np.array, excitation: np.array, out: np.array = None, models: np.array = None) -> np.array:
+        """ Process a block of consecutive voice frames at once, producing the same output and leaving the instance
+            in the same state as calling process_frame() for each one of them, but vocoding all the windows of the
+            block in a batch. With many channels, the windows of all of them are vocoded in the same batch.
+            :param voice: Contains the voice samples, an integer number of frames, or of hops in streaming mode.
+                          With many channels, an array with the samples of each channel in a row.
+                          It can be None when the models are given
+            :param excitation: Contains the excitation samples, an integer number of frames. With many channels,
+                               either one row per channel or a single signal shared by all of them
+            :param out: Optional array where the output samples are written, with the shape of the voice
+            :param models: Optional reflection coefficients of the windows of the block, as returned by
+                           analyze_block(), used instead of analyzing the voice
+            :return: Output samples ready to be reproduced, with the same delay introduced by process_frame()
+        """
+        # Without a voice, the models are applied to silent frames with the shape of the excitation
+        if voice is None:
+            if models is None:
+                raise ValueError('Either the voice or the models are needed')
+            voice = np.zeros(np.shape(excitation)[-1:] if self.channels == 1 else (self.channels, np.shape(excitation)[-1]))
+
+        # The samples are arranged with one channel per row, a single channel can be given as a flat array
+        shape = np.shape(voice)
+        voice = np.reshape(voice, (-1, shape[-1]))
+        if voice.shape[0] != self.channels:
+            raise ValueError(f'Voice blocks must have {self.channels} channels')
+        # Verify if both the voice and the excitation blocks have the same length
+        if np.shape(excitation)[-1] != voice.shape[1]:
+            raise ValueError('Voice and excitation blocks must have the same length')
+        excitation = np.broadcast_to(excitation, voice.shape)
+        if voice.shape[1] % self.hop_size != 0:
+            raise ValueError('Blocks must contain an integer number of frames')
+        frame_count = voice.shape[1] // self.hop_size
+        if out is None:
+            out = np.zeros(shape, dtype=self.dtype)
+        y_out = np.reshape(out, voice.shape)
+        voice = self._emphasize(voice)
+
+        if self.streaming == True:
+            # The models of all the frames of every channel are estimated in a batch, while the synthesis
+            # filter runs over the frames in order because it depends on the previous outputs.
+            # Frames with a muted excitation aren't analyzed, the filter keeps the last model to ring out.
+            # The window of each model ends with its hop, and it starts in the previous hops when they are
+            # shorter than the window, so the windows are strided views of the voice after the stored samples
+            excitation = np.reshape(np.asarray(excitation, dtype=self.dtype), (self.channels, frame_count, self.hop_size))
+            active = np.any(excitation, axis=-1)
+            voice = np.concatenate((self.window, voice), axis=1)
+            windows = np.lib.stride_tricks.sliding_window_view(voice, self.frame_size, axis=1)[:, ::self.hop_size]
+            self.window = voice[:, voice.shape[1] - self.window.shape[1]:]
+            reflections = np.zeros((self.channels, frame_count, self.reflection.shape[1]))
+            if models is not None:
+                reflections[:] = np.reshape(models, reflections.shape)
+            elif np.any(active):
+                _, reflections[active], _ = self.analyze_frames(
+                    windows[active],
+                    self.order,
+                    None,
+                    fast_correlation=self.fast_correlation,
+                    decimation=self.decimation,
+                    order_tolerance=self.order_tolerance
+                )
+            for channel in range(self.channels):
+                for index in range(frame_count):
+                    y_frame = y_out[channel, index * self.hop_size:(index + 1) * self.hop_size]
+                    if active[channel, index] == False:
+                        reflections[channel, index] = self.reflection[channel]
+                        # Once the tail has decayed below any audible level, the filter is cleared
+                        if np.max(np.abs(self.history[channel]), initial=0.0) < SILENCE_LEVEL:
+                            self.history[channel] = 0.0
+                            y_frame[:] = 0.0
+                            continue
+                    y_frame[:], self.history[channel] = self._streaming_filter(
+                        self.reflection[channel],
+                        reflections[channel, index],
+                        excitation[channel, index],
+                        self.history[channel],
+                        self.interpolation_steps
+                    )
+                    self.reflection[channel] = reflections[channel, index]
+            return out
+
+        # The block is preceded by the newest frame in the buffers, x(n-1), then the overlapped window of the
+        # m-th frame of the block starts at m * frame_size + frame_size / 2 and its current window starts at
+        # (m + 1) * frame_size. Strided views of the signals give each window as a row, no data is copied there.
+        # Blocks of other data types are converted while joining them
+        current = self.index * self.frame_size
+        voice = np.concatenate((self.x[:, current:current + self.frame_size], voice), axis=1, dtype=self.dtype)
+        excitation = np.concatenate(
+            (self.excitation[:, current:current + self.frame_size], excitation),
+            axis=1,
+            dtype=self.dtype
+        )
+        excitation_windows = self._overlap_windows(excitation).reshape(-1, self.frame_size)
+        # Windows with a muted excitation produce silence, only the active ones are vocoded
+        active = np.any(excitation_windows, axis=1)
+        y_frames = np.zeros(excitation_windows.shape, dtype=self.dtype)
+        if models is not None and np.any(active):
+            # The models are given with both windows of each frame together, the rows follow the windows
+            k = np.reshape(models, (self.channels, frame_count, 2, -1)).transpose(0, 2, 1, 3).reshape(-1, self.reflection.shape[1])
+            error_coeff = lpc.reflection_to_filter(k[active])
+            if self.order_tolerance is not None:
+                error_coeff = error_coeff[:, :np.flatnonzero(np.any(error_coeff != 0.0, axis=0))[-1] + 1]
+            y_frames[active] = self.synthesize_frames(error_coeff, excitation_windows[active])
+        elif np.any(active):
+            y_frames[active] = self.vocode_frames(
+                self._overlap_windows(voice).reshape(-1, self.frame_size)[active],
+                excitation_windows[active],
+                self.order,
+                None,
+                fast_correlation=self.fast_correlation,
+                decimation=self.decimation,
+                order_tolerance=self.order_tolerance
+            )
+        # Overlap-add buffer with one frame per row, starting with the partial y(n-1) kept in the buffers
+        y = kernels.overlap_add(
+            self.y[:, current:current + self.frame_size],
+            y_frames.reshape(self.channels, 2 * frame_count, self.frame_size)
+        )
+        y_out[:] = y[:, :-1].reshape(self.channels, -1)
+
+        # The buffers are left as after the last call to process_frame(), with the last frame of
+        # the block in the current slot and the one before it in the previous slot
+        if frame_count % 2 == 1:
+            self.index = 1 - self.index
+        current = self.index * self.frame_size
+        previous = (1 - self.index) * self.frame_size
+        self._store_frames(self.x, voice)
+        self._store_frames(self.excitation, excitation)
+        self.y[:, current:current + self.frame_size] = y[:, -1]
+        self.y[:, previous:previous + self.frame_size] = y[:, -2]
+        return out
+
+    def analyze_block(self, voice: np.array) -> np.array:
+        """ Estimates the models of a block of consecutive voice frames, the same ones that process_frames()
+            estimates for them, keeping the state of the voice from one block to the next one. The excitation
+            and the output aren't involved, so the models can be stored and applied later to any excitation
+            by passing them to process_frames().
+            :param voice: Contains the voice samples, an integer number of frames, or of hops in streaming mode.
+                          With many channels, an array with the samples of each channel in a row
+            :return: Reflection coefficients of the models, with shape (channels, frames, windows, order), where the
+                     windows of each frame are the overlapped and the current ones, or a single one in streaming mode
+        """
+        voice = np.reshape(voice, (-1, np.shape(voice)[-1]))
+        if voice.shape[0] != self.channels:
+            raise ValueError(f'Voice blocks must have {self.channels} channels')
+        if voice.shape[1] % self.hop_size != 0:
+            raise ValueError('Blocks must contain an integer number of frames')
+        frame_count = voice.shape[1] // self.hop_size
+        voice = self._emphasize(voice)
+
+        # The windows follow the same layout used by process_frames()
+        if self.streaming == True:
+            voice = np.concatenate((self.window, voice), axis=1)
+            windows = np.lib.stride_tricks.sliding_window_view(voice, self.frame_size, axis=1)[:, ::self.hop_size]
+            self.window = voice[:, voice.shape[1] - self.window.shape[1]:]
+        else:
+            current = self.index * self.frame_size
+            voice = np.concatenate((self.x[:, current:current + self.frame_size], voice), axis=1)
+            windows = self._overlap_windows(voice)
+            if frame_count % 2 == 1:
+                self.index = 1 - self.index
+            self._store_frames(self.x, voice)
+        _, k, _ = self.analyze_frames(
+            windows.reshape(-1, self.frame_size),
+            self.order,
+            None,
+            fast_correlation=self.fast_correlation,
+            decimation=self.decimation,
+            order_tolerance=self.order_tolerance
+        )
+        return k.reshape(self.channels, -1, frame_count, k.shape[-1]).transpose(0, 2, 1, 3)
+
+    def _overlap_windows(self, signal: np.array) -> np.array:
+        """ Gives the windows of a block preceded by the newest frame in the buffers, as strided views.
+            :param signal: Samples of the newest frame followed by the block, one channel per row
+            :return: Overlapped windows of the frames of the block followed by their current windows, for each channel
+        """
+        half_size = self.frame_size // 2
+        windows = np.lib.stride_tricks.sliding_window_view(signal, self.frame_size, axis=1)
+        return np.concatenate((windows[:, half_size::self.frame_size], windows[:, self.frame_size::self.frame_size]), axis=1)
+
+    def _store_frames(self, buffer: np.array, signal: np.array):
+        """ Stores the last frame of a block in the current slot of a circular buffer, and the one before it in the
+            previous slot, updating the mirror of the first half of the slot zero.
+            :param buffer: Circular buffer, x or excitation
+            :param signal: Samples of the block, preceded by the newest frame of the buffer, one channel per row
+        """
+        current = self.index * self.frame_size
+        previous = (1 - self.index) * self.frame_size
+        buffer[:, current:current + self.frame_size] = signal[:, -self.frame_size:]
+        buffer[:, previous:previous + self.frame_size] = signal[:, -2 * self.frame_size:-self.frame_size]
+        buffer[:, self.frame_size * 2:] = buffer[:, :self.frame_size // 2]
+
+    def _emphasize(self, voice: np.array) -> np.array:
+        """ Applies the pre-emphasis filter to the new voice samples, continuing from the previous ones.
+            :param voice: Voice samples, one channel per row
+            :return: Pre-emphasized voice samples, with the data type of the vocoder
+        """
+        voice = np.asarray(voice, dtype=self.dtype)
+        emphasized = lpc.preemphasis(voice, self.alpha, self.last_voice)
+        self.last_voice[:] = voice[:, -1]
+        return emphasized
+
+    def process_signal(self, voice: np.array, excitation: np.array, block_size: int = 256) -> np.array:
+        """ Process a whole voice signal offline, producing the same output as feeding it to a freshly
+            initialized instance frame by frame with process_frame(), but vocoding blocks of frames in batches
+            with process_frames(). The state of this instance isn't modified.
+            :param voice: Contains the voice samples, with many channels one row per channel
+            :param excitation: Contains the excitation samples, one row per channel or shared by all of them
+            :param block_size: Number of frames processed on each batch, bounds the memory used
+            :return: Output samples, with the same delay introduced by process_frame()
+        """
+        # Verify if both the voice and the excitation signals have the same length
+        if np.shape(voice)[-1] != np.shape(excitation)[-1]:
+            raise ValueError('Voice and excitation signals must have the same length')
+
+        # The signals are completed with zeros up to an integer number of frames
+        signal_size = np.shape(voice)[-1]
+        frame_count = -(-signal_size // self.hop_size)
+        padding = (0, frame_count * self.hop_size - signal_size)
+        voice = np.pad(np.asarray(voice, dtype=self.dtype), [(0, 0)] * (np.ndim(voice) - 1) + [padding])
+        excitation = np.pad(np.asarray(excitation, dtype=self.dtype), [(0, 0)] * (np.ndim(excitation) - 1) + [padding])
+
+        # A copy of this instance with the same parameters and a new state keeps the state along the signal
+        v = copy.copy(self)
+        v.reset()
+        y = np.zeros(voice.shape, dtype=self.dtype)
+        for start in range(0, voice.shape[-1], block_size * self.hop_size):
+            stop = start + block_size * self.hop_size
+            v.process_frames(voice[..., start:stop], excitation[..., start:stop], out=y[..., start:stop])
+        return y[..., :signal_size]
+
+    def warm_up(self, frame_size: int):
+        """ Processes a frame of noise with a copy of this instance, so the first frame processed in real time
+            doesn't wait for the packages imported on first use by the filters, nor for the windows computed
+            and cached on first use. The state of this instance isn't modified.
+            :param frame_size: Number of samples of each channel in the frames processed in real time
+        """
+        noise = np.random.default_rng(0).standard_normal((self.channels, frame_size)).astype(self.dtype)
+        self.process_signal(noise, noise)
+
+    @staticmethod
+    def _streaming_filter(
+        reflection_start: np.array,
+        reflection_stop: np.array,
+        excitation_frame: np.array,
+        history: np.array,
+        steps: int
+    ) -> tuple:
+        """ Filters a frame with the all-pole synthesis filter, continuing from the outputs of the previous frame.
+            The frame is split in segments and the reflection coefficients are linearly interpolated along them,
+            which keeps every intermediate filter stable because all the coefficients stay inside (-1, 1).
+            :param reflection_start: Reflection coefficients of the model used in the previous frame
+            :param reflection_stop: Reflection coefficients of the model reached at the end of this frame
+            :param excitation_frame: Excitation samples
+            :param history: Last outputs of the filter, starting from the most recent one
+            :param steps: Number of segments of the frame
+            :return: Tuple (y, history) with the filtered frame and the updated history of outputs
+        """
+        weights = np.arange(1, steps + 1)[:, np.newaxis] / steps
+        error_coeff = lpc.reflection_to_filter(reflection_start + weights * (reflection_stop - reflection_start))
+        return kernels.segment_filter(error_coeff, excitation_frame, history)
 
     @staticmethod
     def vocode_frame(
@@ -80,18 +455,24 @@ class Vocoder:
         alpha: float = 0.97,
         apply_filter: bool = True, 
         apply_window: bool = True,
-        normalize_correlation: bool = True
+        normalize_correlation: bool = True,
+        fast_correlation: bool = False,
+        decimation: int = 1,
+        order_tolerance: float = None
     ) -> np.array:
         """ Applies the vocoder processing algorithm to one frame or window, extracting the model parameters from the voice sequence
             and replacing the voice's generator with the given artificial excitation.
             :param voice_frame: Voice samples
             :param excitation_frame: Excitation samples
             :param order: Order of the articulatory model whose parameters are to be estimated
-            :param alpha: Pre-emphasis high-pass filter coefficient
+            :param alpha: Pre-emphasis high-pass filter coefficient, None if the voice is already pre-emphasized
             :param apply_filter: If false, the output will be directly the excitation frame (without filtering).
             :param apply_window: If false, the output will not have the window applied.
             :param normalize_correlation: If true, the correlation is normalized
-            :return: The vocoded frame
+            :param fast_correlation: If true, only the lags needed are computed with a shorter real FFT
+            :param decimation: Downsampling factor of the voice before estimating the model
+            :param order_tolerance: If given, the order is chosen from the prediction error curve
+            :return: The vocoded frame, with the data type of the excitation (at least single precision)
         """
         # Verify if both the voice and the excitation frames have the same length
         if len(voice_frame) != len(excitation_frame):
@@ -100,30 +481,167 @@ class Vocoder:
         # Get the frame size
         frame_size = len(voice_frame)
 
-        # Apply a pre-emphasis filter to the voice signal to remove
-        # the effect of the glotal pulses produces by the vocal chords
-        voice_frame = librosa.effects.preemphasis(voice_frame, coef=alpha)
-        #signal.lfilter([1.0, -alpha], [1.0], voice_frame)
-
-        # Estimate the short-time autocorrelation of the given data
-        # TODO Use different sizes for each window in the autocorrelation to mitigate bias
-        rxx = signal.correlate(voice_frame, voice_frame, method='fft')
+        if decimation != 1 or order_tolerance is not None:
+            # The extended analysis modes are implemented for batches, the model is estimated as a batch of one
+            # frame, and the coefficients above the order chosen are dropped because they are null
+            error_coeff, _, _ = Vocoder.analyze_frames(
+                voice_frame[np.newaxis],
+                order,
+                alpha,
+                normalize_correlation=normalize_correlation,
+                fast_correlation=fast_correlation,
+                decimation=decimation,
+                order_tolerance=order_tolerance
+            )
+            error_coeff = np.trim_zeros(error_coeff[0], 'b')
+        else:
+            # Apply a pre-emphasis filter to the voice signal to remove
+            # the effect of the glotal pulses produces by the vocal chords
+            if alpha is not None:
+                voice_frame = lpc.preemphasis(voice_frame, alpha)
 
-        # Extract only the needed lags
-        rxx = rxx[len(rxx) // 2 : len(rxx) // 2 + order + 1]
-        if normalize_correlation == True:
-            rxx /= rxx[0]
+            # Estimate the short-time autocorrelation of the given data, with the same real FFT as
+            # analyze_frames(), so a frame gets the same model alone or in a batch
+            # TODO Use different sizes for each window in the autocorrelation to mitigate bias
+            lags = order + 1 if fast_correlation == True else frame_size
+            rxx = lpc.autocorrelation(voice_frame, lags)[:order + 1]
+            if normalize_correlation == True and rxx[0] > 0:
+                rxx /= rxx[0]
 
-        # Use the Levinson-Durbin algorithm to find the error filter coefficients
-        _, ao, _, J, _ = stattools.levinson_durbin(rxx, nlags=len(rxx)-1, isacov=True)
-        predictor_coeff = -ao
-        error_coeff = np.concatenate(([1.0], predictor_coeff))
+            # Use the Levinson-Durbin algorithm to find the error filter coefficients
+            error_coeff, _, _ = lpc.levinson_durbin(rxx)
 
-        # Filter
+        # Filter, the recursion accumulates in double precision and the
+        # result is rounded once to the data type of the excitation
         if apply_filter == True:
-            y = signal.lfilter([1.0], error_coeff, excitation_frame)
+            y = kernels.all_pole_filter(error_coeff[np.newaxis], excitation_frame[np.newaxis])[0]
         else:
             y = excitation_frame
         if apply_window == True:
-            y = y * signal.windows.hann(frame_size)
-        return y
\ No newline at end of file
+            y = y * cache.get_window('hann', frame_size)
+        return y.astype(np.result_type(excitation_frame, np.float32), copy=False)
+
+    @staticmethod
+    def vocode_frames(
+        voice_frames: np.array,
+        excitation_frames: np.array,
+        order: int,
+        alpha: float = 0.97,
+        apply_filter: bool = True,
+        apply_window: bool = True,
+        normalize_correlation: bool = True,
+        fast_correlation: bool = False,
+        decimation: int = 1,
+        order_tolerance: float = None
+    ) -> np.array:
+        """ Applies the vocoder processing algorithm to a batch of frames or windows at once, giving the same result
+            as calling vocode_frame() on each one of them.
+            :param voice_frames: Voice samples, one frame per row
+            :param excitation_frames: Excitation samples, one frame per row
+            :param order: Order of the articulatory model whose parameters are to be estimated
+            :param alpha: Pre-emphasis high-pass filter coefficient, None if the voice is already pre-emphasized
+            :param apply_filter: If false, the output will be directly the excitation frames (without filtering).
+            :param apply_window: If false, the output will not have the window applied.
+            :param normalize_correlation: If true, the correlation is normalized
+            :param fast_correlation: If true, only the lags needed are computed with a shorter real FFT
+            :param decimation: Downsampling factor of the voice before estimating the model
+            :param order_tolerance: If given, the order of each frame is chosen from its prediction error curve
+            :return: The vocoded frames, one frame per row, with the data type of the excitation (at least single precision)
+        """
+        # Verify if both the voice and the excitation frames have the same shape
+        if np.shape(voice_frames) != np.shape(excitation_frames):
+            raise ValueError('Voice and excitation frames must have the same shape')
+
+        # Estimate the model of each frame
+        error_coeff, _, _ = Vocoder.analyze_frames(
+            voice_frames,
+            order,
+            alpha,
+            normalize_correlation=normalize_correlation,
+            fast_correlation=fast_correlation,
+            decimation=decimation,
+            order_tolerance=order_tolerance
+        )
+
+        # With adaptive orders, the coefficients above the highest order chosen are null in every frame
+        if order_tolerance is not None:
+            error_coeff = error_coeff[:, :np.flatnonzero(np.any(error_coeff != 0.0, axis=0))[-1] + 1]
+        return Vocoder.synthesize_frames(error_coeff, excitation_frames, apply_filter, apply_window)
+
+    @staticmethod
+    def synthesize_frames(
+        error_coeff: np.array,
+        excitation_frames: np.array,
+        apply_filter: bool = True,
+        apply_window: bool = True
+    ) -> np.array:
+        """ Applies the articulatory models already estimated to a batch of frames or windows of the excitation.
+            :param error_coeff: Error filter coefficients of the model of each frame, one frame per row
+            :param excitation_frames: Excitation samples, one frame per row
+            :param apply_filter: If false, the output will be directly the excitation frames (without filtering).
+            :param apply_window: If false, the output will not have the window applied.
+            :return: The vocoded frames, one frame per row, with the data type of the excitation (at least single precision)
+        """
+        # Filter, the recursion accumulates in double precision and the
+        # result is rounded once to the data type of the excitation
+        if apply_filter == True:
+            y = kernels.all_pole_filter(error_coeff, excitation_frames)
+        else:
+            y = excitation_frames
+        if apply_window == True:
+            y = y * cache.get_window('hann', excitation_frames.shape[-1])
+        return y.astype(np.result_type(excitation_frames, np.float32), copy=False)
+
+    @staticmethod
+    def analyze_frames(
+        voice_frames: np.array,
+        order: int,
+        alpha: float = 0.97,
+        normalize_correlation: bool = True,
+        fast_correlation: bool = False,
+        decimation: int = 1,
+        order_tolerance: float = None
+    ) -> tuple:
+        """ Estimates the parameters of the articulatory model of a batch of frames at once.
+            :param voice_frames: Voice samples, one frame per row
+            :param order: Order of the articulatory model whose parameters are to be estimated
+            :param alpha: Pre-emphasis high-pass filter coefficient, None if the voice is already pre-emphasized
+            :param normalize_correlation: If true, the correlation is normalized
+            :param fast_correlation: If true, only the lags needed are computed with a shorter real FFT
+            :param decimation: Downsampling factor of the voice before estimating the model, the model has
+                               order / decimation and it is mapped back to the original sampling rate
+            :param order_tolerance: If given, the order of each frame is the lowest one whose prediction error
+                                    exceeds the error of the highest order by less than this relative tolerance,
+                                    the reflection coefficients of the stages above it are null
+            :return: Tuple (a, k, error) as returned by lpc.levinson_durbin(), one frame per row
+        """
+        # Apply the pre-emphasis filter to every frame
+        if alpha is not None:
+            voice_frames = lpc.preemphasis(voice_frames, alpha)
+
+        # The voice is downsampled after the pre-emphasis, and a model with a lower order is estimated
+        if decimation > 1:
+            voice_frames = lpc.decimate(voice_frames, decimation)
+            order = lpc.decimated_order(order, decimation)
+
+        # Get the frame size
+        frame_size = voice_frames.shape[-1]
+
+        # Estimate the short-time autocorrelation of all the frames with a single real FFT, which
+        # is as long as the full autocorrelation unless only the lags needed are requested
+        lags = order + 1 if fast_correlation == True else frame_size
+        rxx = lpc.autocorrelation(voice_frames, lags)[:, :order + 1]
+        if normalize_correlation == True:
+            rxx /= np.where(rxx[:, :1] > 0, rxx[:, :1], 1.0)
+
+        # Use the Levinson-Durbin algorithm to find the error filter coefficients of each frame,
+        # and map the models estimated from the downsampled voice back to the original sampling rate
+        a, k, error = lpc.levinson_durbin(rxx)
+        if decimation > 1:
+            a, k, error = lpc.resample_model(a, decimation)
+
+        # The stages above the order chosen for each frame are removed
+        if order_tolerance is not None:
+            k[np.arange(order) >= lpc.select_order(error, order_tolerance)[:, np.newaxis]] = 0.0
+            a = lpc.reflection_to_filter(k)
+        return a, k, error
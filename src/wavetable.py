@@ -0,0 +1,87 @@
+# Custom Libraries
+import oscillator
+
+# Third-Party Libraries
+import numpy as np
+
+# Native-Python Libraries
+import os
+
+# Range of MIDI notes covered by the tables
+LOWEST_NOTE = 0
+HIGHEST_NOTE = 127
+
+def note_frequency(note: float) -> float:
+    """ Converts a MIDI note number into its fundamental frequency.
+        :param note: MIDI note number
+        :return: Frequency in Hz
+    """
+    return 440 * (2**((note - 69) / 12))
+
+class Wavetable:
+
+    def __init__(
+        self,
+        waveform: str,
+        sample_rate: int,
+        table_size: int = 2048,
+        notes_per_table: int = 4,
+        directory: str = None
+    ):
+        """ Initializes the Wavetable instance, a mip-map of bandlimited tables of one waveform where each table
+            serves a range of MIDI notes and holds only the harmonics below the Nyquist frequency for the highest
+            note of its range. The tables are computed once, and when a directory is given they are stored there
+            and memory-mapped by later instances, so the startup doesn't need to compute them again.
+            :param waveform: 'square', 'saw' or 'blit', as accepted by oscillator.bandlimited_table()
+            :param sample_rate: Sampling rate
+            :param table_size: Number of samples of each table, a power of two
+            :param notes_per_table: Number of MIDI notes served by each table
+            :param directory: Optional directory where the tables are stored
+        """
+        if notes_per_table < 1:
+            raise ValueError('Each table has to serve at least one note')
+        if table_size < 4 or table_size & (table_size - 1) != 0:
+            raise ValueError('The size of the tables has to be a power of two')
+
+        self.waveform = waveform
+        self.sample_rate = sample_rate
+        self.table_size = table_size
+        self.notes_per_table = notes_per_table
+
+        path = None
+        if directory is not None:
+            path = os.path.join(directory, f'{waveform}_{sample_rate}_{table_size}_{notes_per_table}.npy')
+        if path is not None and os.path.exists(path):
+            self.tables = np.load(path, mmap_mode='r')
+        else:
+            self.tables = self._compute_tables()
+            if path is not None:
+                # The file is written under a temporary name and renamed, so that other processes
+                # never memory-map a partially written file
+                os.makedirs(directory, exist_ok=True)
+                temporary_path = f'{path}.{os.getpid()}.tmp'
+                with open(temporary_path, 'wb') as file:
+                    np.save(file, self.tables)
+                os.replace(temporary_path, path)
+
+    def table_index(self, frequency: np.array) -> np.array:
+        """ Finds the table which serves each frequency, frequencies outside of the range of notes
+            use the closest table.
+            :param frequency: Fundamental frequencies
+            :return: Index of the table of each frequency
+        """
+        note = 69 + 12 * np.log2(np.asarray(frequency) / 440)
+        index = np.floor((note - LOWEST_NOTE) / self.notes_per_table).astype(np.intp)
+        return np.clip(index, 0, len(self.tables) - 1)
+
+    def _compute_tables(self) -> np.array:
+        """ Computes all the tables of the mip-map.
+            :return: Array with one table per row, each one with a guard sample at the end
+        """
+        lowest_notes = np.arange(LOWEST_NOTE, HIGHEST_NOTE + 1, self.notes_per_table)
+        tables = np.zeros((len(lowest_notes), self.table_size + 1), dtype=np.float32)
+        for index, lowest_note in enumerate(lowest_notes):
+            highest_frequency = note_frequency(lowest_note + self.notes_per_table)
+            harmonics = int(self.sample_rate / 2 // highest_frequency)
+            tables[index] = oscillator.bandlimited_table(self.waveform, harmonics, self.table_size)
+        return tables
@@ -0,0 +1,359 @@
+# Allows running the script from any directory, the modules of the project are in src/
+import os
+import sys
+SOURCE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+ASSETS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'assets')
+sys.path.insert(0, SOURCE_DIRECTORY)
+
+# Custom Libraries
+import carrier
+import kernels
+import lpc
+import pipeline
+import spectral
+import synthesizer
+import track
+import vocoder
+
+# Third-Party Libraries
+import numpy as np
+import soundfile as sf
+
+# Native-Python Libraries
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import time
+
+SAMPLE_RATE = 48000
+
+# Combinations of (window time, order) measured for the vocoder
+VOCODER_CASES = [(10e-3, 16), (20e-3, 16), (20e-3, 32), (20e-3, 48), (40e-3, 48)]
+
+# Number of voices measured for the synthesizer
+SYNTHESIZER_VOICES = [1, 2, 4, 8, 16]
+
+# Pairs of (voice, carrier) files rendered end to end
+RENDER_CASES = [('man_48000.wav', 'jazzy_riff.wav'), ('man_48000.wav', 'electric_guitar.wav'), ('voice_1.wav', 'voice_0.wav')]
+
+# Modules whose import time is measured, with the heavy packages they must not import. The filters still load
+# scipy.signal on first use, which benchmark_first_frame() verifies is done before the first real-time frame
+IMPORT_CASES = {
+    'vocoder': ('librosa', 'scipy.signal', 'numba'),
+    'spectral': ('librosa', 'scipy.signal', 'numba'),
+    'synthesizer': ('librosa', 'scipy', 'numba'),
+    'pipeline': ('librosa', 'scipy.signal', 'numba')
+}
+
+# Real-time configurations of (engine, frame size, hop size) whose first frame is measured after warming up
+FIRST_FRAME_CASES = [('lpc', 3840, None), ('lpc', 128, 128), ('spectral', 3840, None)]
+
+def measure(function, repetitions: int, warmup: int = 5) -> np.array:
+    """ Measures the time taken by each call to a function.
+        :param function: Function called without arguments
+        :param repetitions: Number of calls measured
+        :param warmup: Number of calls made before measuring, to fill the caches
+        :return: Time of each call in seconds
+    """
+    for _ in range(warmup):
+        function()
+    times = np.zeros((repetitions))
+    for index in range(repetitions):
+        start = time.perf_counter()
+        function()
+        times[index] = time.perf_counter() - start
+    return times
+
+def summarize(name: str, parameters: dict, times: np.array, duration: float = None) -> dict:
+    """ Builds the result of a measurement, with the latency percentiles and the real-time factor.
+        :param name: Name of the benchmark
+        :param parameters: Parameters of the case measured
+        :param times: Time of each call in seconds
+        :param duration: Duration of the audio produced by each call in seconds, if it produces audio
+        :return: Dictionary with the results, times in milliseconds
+    """
+    result = {'name': name, 'parameters': parameters, 'calls': len(times)}
+    for percentile in (50, 90, 99):
+        result[f'p{percentile}_ms'] = float(np.percentile(times, percentile)) * 1e3
+    result['max_ms'] = float(times.max()) * 1e3
+    result['mean_ms'] = float(times.mean()) * 1e3
+    # How many times faster than real time, above one the processing keeps up with the audio
+    if duration is not None:
+        result['realtime_factor'] = duration / float(times.mean())
+    return result
+
+def benchmark_vocoder(repetitions: int) -> list:
+    """ Measures Vocoder.process_frame() in both modes, and the static Vocoder.vocode_frame().
+    """
+    results = []
+    rng = np.random.default_rng(0)
+    for window_time, order in VOCODER_CASES:
+        window_size = int(window_time * SAMPLE_RATE)
+        voice = rng.standard_normal((repetitions + 5, window_size)).astype(np.float32)
+        excitation = rng.standard_normal((repetitions + 5, window_size)).astype(np.float32)
+        parameters = {'window_size': window_size, 'order': order}
+
+        for streaming in (False, True):
+            v = vocoder.Vocoder(window_size, order, 0.97, streaming=streaming)
+            out = np.zeros((window_size), dtype=np.float32)
+            frames = iter(range(len(voice)))
+            def process_frame():
+                index = next(frames)
+                v.process_frame(voice[index], excitation[index], out=out)
+            name = 'Vocoder.process_frame[streaming]' if streaming else 'Vocoder.process_frame'
+            results.append(summarize(name, parameters, measure(process_frame, repetitions), window_time))
+
+        results.append(summarize(
+            'Vocoder.vocode_frame',
+            parameters,
+            measure(lambda: vocoder.Vocoder.vocode_frame(voice[0], excitation[0], order, 0.97), repetitions),
+            # Each window is processed twice in overlap mode
+            window_time / 2
+        ))
+    return results
+
+def benchmark_synthesizer(repetitions: int) -> list:
+    """ Measures Synthesizer.generate_frame() with many notes playing, with every waveform.
+    """
+    results = []
+    frame_size = int(80e-3 * SAMPLE_RATE)
+    for waveform in synthesizer.WAVEFORMS:
+        for voices in SYNTHESIZER_VOICES:
+            s = synthesizer.create_synthesizer(frame_size, SAMPLE_RATE, waveform)
+            for note in range(voices):
+                s.note_on(0.01, 440 * (2**((48 + 3 * note - 69) / 12)))
+            out = np.zeros((frame_size), dtype=np.float32)
+            parameters = {'frame_size': frame_size, 'waveform': waveform, 'voices': voices}
+            times = measure(lambda: s.generate_frame(out=out), repetitions)
+            results.append(summarize('Synthesizer.generate_frame', parameters, times, frame_size / SAMPLE_RATE))
+    return results
+
+def benchmark_render(repetitions: int) -> list:
+    """ Measures the offline render of the bundled assets, from file to file, both analyzing the voice
+        and applying the envelope track analyzed before.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        output_path = os.path.join(directory, 'output.wav')
+        track_path = os.path.join(directory, 'voice.track')
+        for voice_name, carrier_name in RENDER_CASES:
+            voice_path = os.path.join(ASSETS_DIRECTORY, voice_name)
+            carrier_path = os.path.join(ASSETS_DIRECTORY, carrier_name)
+            info = sf.info(voice_path)
+            window_size = int(20e-3 * info.samplerate)
+            frame_size = 4 * window_size
+            def render():
+                source = carrier.FileCarrier(carrier_path, frame_size, info.samplerate)
+                try:
+                    pipeline.render(voice_path, source, output_path, frame_size, window_size, 48, 0.97)
+                finally:
+                    source.close()
+            def render_track():
+                source = carrier.FileCarrier(carrier_path, frame_size, info.samplerate)
+                try:
+                    track.render(track_path, source, output_path, frame_size)
+                finally:
+                    source.close()
+            parameters = {'voice': voice_name, 'carrier': carrier_name}
+            times = measure(render, repetitions, warmup=1)
+            results.append(summarize('pipeline.render', parameters, times, info.frames / info.samplerate))
+            track.analyze(voice_path, track_path, window_size, 48, 0.97)
+            times = measure(render_track, repetitions, warmup=1)
+            results.append(summarize('track.render', parameters, times, info.frames / info.samplerate))
+    return results
+
+def benchmark_kernels(repetitions: int) -> list:
+    """ Measures the DSP kernels with each backend available, on a block of eight windows of 20 ms, and the
+        all-pole filter also on a block larger than kernels.ROW_FILTER_ROWS. The outputs of the backends are
+        compared by tests/test_kernels.py.
+        :param repetitions: Number of calls measured per kernel
+    """
+    results = []
+    rng = np.random.default_rng(0)
+    window_size = int(20e-3 * SAMPLE_RATE)
+    frames = rng.standard_normal((8, window_size)).astype(np.float32)
+    r = lpc.autocorrelation(frames.astype(np.float64), 49)
+    a, _, _ = kernels.levinson_durbin(r)
+    large_frames = rng.standard_normal((128, window_size)).astype(np.float32)
+    large_a, _, _ = kernels.levinson_durbin(lpc.autocorrelation(large_frames.astype(np.float64), 49))
+    history = np.zeros((48))
+    partial = np.zeros((1, window_size), dtype=np.float32)
+    cases = [
+        ('all_pole_filter', 8, lambda: kernels.all_pole_filter(a, frames)),
+        ('all_pole_filter', 128, lambda: kernels.all_pole_filter(large_a, large_frames)),
+        ('segment_filter', 1, lambda: kernels.segment_filter(a, frames[0], history)),
+        ('levinson_durbin', 8, lambda: kernels.levinson_durbin(r)),
+        ('preemphasis', 8, lambda: kernels.preemphasis(frames, np.float32(0.97), frames[:, -1])),
+        ('overlap_add', 8, lambda: kernels.overlap_add(partial, frames.reshape(1, 8, window_size)))
+    ]
+
+    previous = kernels.get_backend()
+    for backend in ('numpy', 'numba'):
+        try:
+            kernels.set_backend(backend)
+        except ImportError:
+            continue
+        for name, windows, kernel in cases:
+            parameters = {'backend': backend, 'window_size': window_size, 'windows': windows}
+            results.append(summarize(f'kernels.{name}', parameters, measure(kernel, repetitions)))
+    kernels.set_backend(previous)
+    return results
+
+def check_dtypes() -> list:
+    """ Verifies that the vocoders and the synthesizer produce samples of the data type they are configured with,
+        in single and double precision, and that the arrays given as out are written in place instead of copied.
+        :return: List of messages describing the outputs with another data type or written into a copy
+    """
+    violations = []
+    rng = np.random.default_rng(0)
+    window_size = int(20e-3 * SAMPLE_RATE)
+    frame_size = 4 * window_size
+    for dtype in (np.float32, np.float64):
+        voice = rng.standard_normal((frame_size)).astype(dtype)
+        excitation = rng.standard_normal((frame_size)).astype(dtype)
+        cases = {
+            'Vocoder': vocoder.Vocoder(window_size, 32, 0.97, dtype=dtype),
+            'SpectralVocoder': spectral.SpectralVocoder(window_size, 32, 0.97, dtype=dtype)
+        }
+        outputs = {}
+        for name, v in cases.items():
+            out = np.zeros((window_size), dtype=dtype)
+            outputs[f'{name}.process_frame'] = (v.process_frame(voice[:window_size], excitation[:window_size], out=out), out)
+            out = np.zeros((frame_size), dtype=dtype)
+            outputs[f'{name}.process_frames'] = (v.process_frames(voice, excitation, out=out), out)
+            outputs[f'{name}.process_signal'] = (v.process_signal(voice, excitation), None)
+        s = synthesizer.Synthesizer(frame_size, SAMPLE_RATE, dtype=dtype)
+        s.note_on(0.1, 440.0)
+        out = np.zeros((frame_size), dtype=dtype)
+        outputs['Synthesizer.generate_frame'] = (s.generate_frame(out=out), out)
+        outputs['Synthesizer.generate_frame (new array)'] = (s.generate_frame(), None)
+
+        for name, (output, out) in outputs.items():
+            if output.dtype != dtype:
+                violations.append(f'{name} gives {output.dtype} samples instead of {np.dtype(dtype)}')
+            if out is not None and (output is not out or not np.shares_memory(output, out)):
+                violations.append(f'{name} doesn\'t write its {np.dtype(dtype)} output in place')
+    return violations
+
+def benchmark_imports(repetitions: int) -> tuple:
+    """ Measures the time taken to import the modules of the project, each one in a new interpreter
+        because the modules are imported only once per process.
+        :param repetitions: Number of interpreters started per module
+        :return: Tuple (results, violations) with the results and the messages describing the heavy
+                 packages imported by modules which must not import them
+    """
+    results = []
+    violations = []
+    for module, forbidden in IMPORT_CASES.items():
+        code = (
+            'import json, sys, time\n'
+            'start = time.perf_counter()\n'
+            f'import {module}\n'
+            'elapsed = time.perf_counter() - start\n'
+            f'print(json.dumps([elapsed, [name for name in {forbidden!r} if name in sys.modules]]))\n'
+        )
+        times = np.zeros((repetitions))
+        for index in range(repetitions):
+            output = subprocess.run([sys.executable, '-c', code], cwd=SOURCE_DIRECTORY, capture_output=True, check=True)
+            times[index], imported = json.loads(output.stdout)
+        for name in imported:
+            violations.append(f'import {module} imports {name}')
+        results.append(summarize('import', {'module': module}, times))
+    return results, violations
+
+def benchmark_first_frame() -> tuple:
+    """ Measures the first frame processed by a new vocoder after Vocoder.warm_up(), as the Engine does before
+        starting the streams, each one in a new interpreter because the packages are imported only once per process.
+        :return: Tuple (results, violations) with the results and the messages describing the first frames
+                 which miss their deadline
+    """
+    results = []
+    violations = []
+    window_size = int(20e-3 * SAMPLE_RATE)
+    for engine, frame_size, hop_size in FIRST_FRAME_CASES:
+        code = (
+            'import json, time\n'
+            'import numpy as np\n'
+            'import pipeline\n'
+            f'v = pipeline.create_vocoder({engine!r}, {window_size}, 48, 0.97, streaming={hop_size is not None}, hop_size={hop_size})\n'
+            f'v.warm_up({frame_size})\n'
+            f'frame = np.random.default_rng(1).standard_normal({frame_size}).astype(np.float32)\n'
+            'start = time.perf_counter()\n'
+            'v.process_frames(frame, frame)\n'
+            'print(json.dumps(time.perf_counter() - start))\n'
+        )
+        output = subprocess.run([sys.executable, '-c', code], cwd=SOURCE_DIRECTORY, capture_output=True, check=True)
+        elapsed = json.loads(output.stdout)
+        parameters = {'engine': engine, 'frame_size': frame_size, 'hop_size': hop_size}
+        if elapsed > frame_size / SAMPLE_RATE:
+            violations.append(f'the first frame of {parameters} takes {elapsed * 1e3:.1f} ms')
+        results.append(summarize('first frame', parameters, np.array([elapsed])))
+    return results, violations
+
+def compare(results: list, baseline: list, tolerance: float) -> list:
+    """ Finds the cases which got slower than in a previous run.
+        :param results: Results of this run
+        :param baseline: Results of the previous run
+        :param tolerance: Relative increase of the median latency allowed
+        :return: List of messages describing the regressions
+    """
+    previous = {(result['name'], json.dumps(result['parameters'], sort_keys=True)): result for result in baseline}
+    regressions = []
+    for result in results:
+        key = (result['name'], json.dumps(result['parameters'], sort_keys=True))
+        if key in previous and result['p50_ms'] > previous[key]['p50_ms'] * (1 + tolerance):
+            regressions.append(
+                f'{result["name"]} {result["parameters"]}: {previous[key]["p50_ms"]:.3f} ms -> {result["p50_ms"]:.3f} ms'
+            )
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks of the vocoder hot paths')
+    parser.add_argument('-o', '--output', help='JSON file where the results are stored')
+    parser.add_argument('--baseline', help='JSON file with the results of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Relative slowdown reported as a regression')
+    parser.add_argument('--repetitions', type=int, default=200, help='Number of calls measured per case')
+    parser.add_argument('--render-repetitions', type=int, default=3, help='Number of renders measured per file')
+    parser.add_argument('--import-repetitions', type=int, default=5, help='Number of interpreters started per module')
+    arguments = parser.parse_args()
+
+    results, violations = benchmark_imports(arguments.import_repetitions)
+    first_frame_results, late_frames = benchmark_first_frame()
+    results += first_frame_results
+    results += benchmark_kernels(arguments.repetitions)
+    results += benchmark_vocoder(arguments.repetitions)
+    results += benchmark_synthesizer(arguments.repetitions)
+    results += benchmark_render(arguments.render_repetitions)
+    for result in results:
+        print(
+            f'{result["name"]:36} {json.dumps(result["parameters"]):70} '
+            f'p50 {result["p50_ms"]:8.3f} ms  p99 {result["p99_ms"]:8.3f} ms'
+            + (f'  x{result["realtime_factor"]:.1f}' if 'realtime_factor' in result else '')
+        )
+    for violation in violations:
+        print(f'Heavy import: {violation}')
+    for late_frame in late_frames:
+        print(f'Deadline miss: {late_frame}')
+    upcasts = check_dtypes()
+    for upcast in upcasts:
+        print(f'Data type: {upcast}')
+    violations += late_frames + upcasts
+
+    if arguments.output is not None:
+        report = {
+            'machine': {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform()},
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'results': results
+        }
+        with open(arguments.output, 'w') as file:
+            json.dump(report, file, indent=4)
+
+    if arguments.baseline is not None:
+        with open(arguments.baseline) as file:
+            regressions = compare(results, json.load(file)['results'], arguments.tolerance)
+        for regression in regressions:
+            print(f'Regression: {regression}')
+        violations += regressions
+    sys.exit(1 if len(violations) > 0 else 0)
@@ -0,0 +1,2 @@
+# tests/test_with_mido.py is a script playing the synthesizer through the audio devices, not a test
+collect_ignore = ['test_with_mido.py']
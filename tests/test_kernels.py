@@ -0,0 +1,115 @@
+# Allows running the tests from any directory, the modules of the project are in src/
+import os
+import sys
+SOURCE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SOURCE_DIRECTORY)
+
+# Custom Libraries
+import kernels
+import lpc
+import vocoder
+
+# Third-Party Libraries
+import numpy as np
+import pytest
+
+# Size of the windows of 20 ms at 48 kHz
+WINDOW_SIZE = 960
+
+# Order of the filters compared
+ORDER = 48
+
+# Tolerances of the comparisons, the backends may add the products of the filters in another order
+RTOL = 1e-9
+ATOL = 1e-9
+
+@pytest.fixture(autouse=True)
+def numpy_backend():
+    """ Restores the NumPy backend after each test.
+    """
+    yield
+    kernels.set_backend('numpy')
+
+def run_backends(kernel):
+    """ Runs a kernel with the NumPy backend and with the Numba one, which is skipped when it isn't installed.
+        :param kernel: Function called without arguments
+        :return: Tuple (expected, actual) with the arrays returned with each backend
+    """
+    pytest.importorskip('numba')
+    kernels.set_backend('numpy')
+    expected = kernel()
+    kernels.set_backend('numba')
+    actual = kernel()
+    as_tuple = lambda output: output if isinstance(output, tuple) else (output,)
+    return as_tuple(expected), as_tuple(actual)
+
+def voice_models(rows: int, dtype) -> tuple:
+    """ Builds windows of noise and the stable all-pole models estimated from them.
+        :param rows: Number of windows
+        :param dtype: Data type of the windows
+        :return: Tuple (frames, a, r) with the windows, the coefficients of the models and the autocorrelation
+    """
+    rng = np.random.default_rng(rows)
+    frames = rng.standard_normal((rows, WINDOW_SIZE)).astype(dtype)
+    r = lpc.autocorrelation(frames.astype(np.float64), ORDER + 1)
+    a, _, _ = kernels.levinson_durbin(r)
+    return frames, a, r
+
+@pytest.mark.parametrize('dtype', [np.float32, np.float64])
+@pytest.mark.parametrize('rows', [8, kernels.ROW_FILTER_ROWS + 64])
+def test_all_pole_filter(rows, dtype):
+    frames, a, _ = voice_models(rows, dtype)
+    expected, actual = run_backends(lambda: kernels.all_pole_filter(a, frames))
+    np.testing.assert_allclose(actual[0], expected[0], rtol=RTOL, atol=ATOL)
+
+def test_all_pole_filter_batch_sizes():
+    # The NumPy backend filters small batches row by row and large ones with the recursion over the samples
+    frames, a, _ = voice_models(kernels.ROW_FILTER_ROWS + 64, np.float64)
+    batched = kernels.all_pole_filter(a, frames)
+    by_rows = np.concatenate([kernels.all_pole_filter(a[row:row + 1], frames[row:row + 1]) for row in range(len(frames))])
+    np.testing.assert_allclose(batched, by_rows, rtol=RTOL, atol=ATOL)
+
+@pytest.mark.parametrize('dtype', [np.float32, np.float64])
+@pytest.mark.parametrize('steps', [1, 8, 150])
+def test_segment_filter(steps, dtype):
+    frames, _, _ = voice_models(2, dtype)
+    rng = np.random.default_rng(steps)
+    k = rng.uniform(-0.9, 0.9, (steps, ORDER))
+    a = lpc.reflection_to_filter(k)
+    history = rng.standard_normal((ORDER))
+    expected, actual = run_backends(lambda: kernels.segment_filter(a, frames[0, :128], history))
+    for x, y in zip(expected, actual):
+        np.testing.assert_allclose(y, x, rtol=RTOL, atol=ATOL)
+
+def test_levinson_durbin():
+    _, _, r = voice_models(8, np.float64)
+    expected, actual = run_backends(lambda: kernels.levinson_durbin(r))
+    for x, y in zip(expected, actual):
+        np.testing.assert_allclose(y, x, rtol=RTOL, atol=ATOL)
+
+@pytest.mark.parametrize('dtype', [np.float32, np.float64])
+@pytest.mark.parametrize('continued', [False, True])
+def test_preemphasis(continued, dtype):
+    frames, _, _ = voice_models(8, dtype)
+    previous = frames[:, -1] if continued else None
+    expected, actual = run_backends(lambda: kernels.preemphasis(frames, dtype(0.97), previous))
+    assert actual[0].dtype == dtype
+    np.testing.assert_allclose(actual[0], expected[0], rtol=RTOL, atol=ATOL)
+
+@pytest.mark.parametrize('dtype', [np.float32, np.float64])
+@pytest.mark.parametrize('frame_size', [WINDOW_SIZE, WINDOW_SIZE + 1])
+def test_overlap_add(frame_size, dtype):
+    rng = np.random.default_rng(frame_size)
+    partial = rng.standard_normal((2, frame_size)).astype(dtype)
+    windows = rng.standard_normal((2, 8, frame_size)).astype(dtype)
+    expected, actual = run_backends(lambda: kernels.overlap_add(partial, windows))
+    np.testing.assert_allclose(actual[0], expected[0], rtol=RTOL, atol=ATOL)
+
+@pytest.mark.parametrize('options', [{}, {'streaming': True}, {'streaming': True, 'hop_size': 64}])
+def test_vocoder(options):
+    rng = np.random.default_rng(0)
+    voice = rng.standard_normal((4 * WINDOW_SIZE))
+    excitation = rng.standard_normal((4 * WINDOW_SIZE))
+    v = vocoder.Vocoder(WINDOW_SIZE, ORDER, 0.97, dtype=np.float64, **options)
+    expected, actual = run_backends(lambda: v.process_signal(voice, excitation))
+    np.testing.assert_allclose(actual[0], expected[0], rtol=RTOL, atol=ATOL)